@@ -2,98 +2,349 @@ from __future__ import annotations
 
 import email.utils
 import logging
+import threading
+import time
 from base64 import urlsafe_b64decode
 from datetime import datetime, timedelta
-from typing import List, Optional, Tuple
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
 
 import google.oauth2.credentials
-from googleapiclient.discovery import Resource, build
+import google_auth_httplib2
+from googleapiclient.discovery import Resource, build, build_from_document
 from googleapiclient.errors import HttpError
 
+from .rate_limit import (
+    KeyedTokenBuckets,
+    TokenBucket,
+    get_backoff,
+    get_quota_units,
+    get_retry_after,
+    is_rate_limit_error,
+)
+from .transport import PooledHttp
+
+try:
+    # discovery documents bundled with google-api-python-client 2+
+    from googleapiclient.discovery_cache import get_static_doc
+except ImportError:
+    get_static_doc = None
+
 logger = logging.getLogger(__name__)
 
 
 class GoogleApiClient:
+    # Gmail rejects batch requests with more than 100 calls
+    BATCH_MAX_SIZE = 100
+    BATCH_MAX_RETRIES = 3
+    BATCH_RETRY_BACKOFF_SECONDS = 1.0
+
+    # Partial responses (fields=), only what the callers below read
+    LIST_MESSAGES_FIELDS = "messages/id,nextPageToken"
+    LIST_HISTORY_FIELDS = "history/messagesAdded/message/id,nextPageToken,historyId"
+    # headers plus the html/text bodies read by get_email_html_body and get_email_text_body
+    MESSAGE_FIELDS = (
+        "id,labelIds,"
+        "payload(headers(name,value),body/data,parts(headers(name,value),body/data))"
+    )
+    METADATA_MESSAGE_FIELDS = "id,labelIds,payload/headers(name,value)"
+
+    # Retries of requests gmail rate limited, with jittered exponential backoff
+    REQUEST_MAX_RETRIES = 5
+    REQUEST_RETRY_BACKOFF_SECONDS = 1.0
+    REQUEST_RETRY_MAX_BACKOFF_SECONDS = 64.0
+
+    # Process wide cap on in flight gmail requests, see set_max_concurrent_requests
+    request_semaphore: Optional[threading.BoundedSemaphore] = None
+    # Process wide gmail quota units per second, see set_rate_limit
+    rate_limiter: Optional[TokenBucket] = None
+    # Gmail quota units per second of each user, see set_user_rate_limit
+    user_rate_limiter: Optional[KeyedTokenBuckets] = None
+    # Process wide pool of http connections, see set_http_pool_size
+    http_pool: Optional[PooledHttp] = None
+
+    _request_stats = {
+        "requests": 0,
+        "quota_units": 0,
+        "throttled": 0,
+        "retries": 0,
+        "rate_limit_wait_seconds": 0.0,
+    }
+    _request_stats_lock = threading.Lock()
+
+    # Gmail discovery document, loaded once per process, see get_discovery_document
+    discovery_document: Optional[str] = None
+
     credentials: Optional[google.oauth2.credentials.Credentials] = None
-    gmail_service: Optional[Resource] = None
 
-    def __init__(self, credentials: google.oauth2.credentials.Credentials):
+    def __init__(
+        self,
+        credentials: google.oauth2.credentials.Credentials,
+        user_key: Optional[Hashable] = None,
+    ):
         self.credentials = credentials
+        # user's key in user_rate_limiter, clients without one are limited on their own
+        self.user_key = user_key if user_key is not None else id(self)
+        # access token last handed out by get_refreshed_credentials_json
+        self._saved_token = getattr(credentials, "token", None)
+        # gmail services per thread, their http transport isn't thread safe
+        self._local = threading.local()
+
+    @classmethod
+    def set_max_concurrent_requests(cls, max_requests: Optional[int]):
+        """Limit the number of gmail requests in flight across all clients in this process.
+
+        Args:
+            max_requests (Optional[int]): max in flight requests, None to remove the limit
+        """
+        if max_requests:
+            cls.request_semaphore = threading.BoundedSemaphore(max_requests)
+        else:
+            cls.request_semaphore = None
+
+    @classmethod
+    def set_rate_limit(
+        cls, quota_units_per_second: Optional[float], burst: Optional[float] = None
+    ):
+        """Pace gmail requests across all clients in this process by quota units,
+        see rate_limit.GMAIL_QUOTA_UNITS.
+
+        Args:
+            quota_units_per_second (Optional[float]): None (or 0) to remove the limit
+            burst (Optional[float]): units that can be used at once, defaults to one second's worth
+        """
+        if quota_units_per_second:
+            cls.rate_limiter = TokenBucket(quota_units_per_second, burst)
+        else:
+            cls.rate_limiter = None
+
+    @classmethod
+    def set_user_rate_limit(
+        cls, quota_units_per_second: Optional[float], burst: Optional[float] = None
+    ):
+        """Pace gmail requests of each user (by the clients' user_key) in this process
+        by quota units, on top of set_rate_limit. Gmail's quota for a user is 250
+        units per second.
+
+        Args:
+            quota_units_per_second (Optional[float]): None (or 0) to remove the limit
+            burst (Optional[float]): units that can be used at once, defaults to one second's worth
+        """
+        if quota_units_per_second:
+            cls.user_rate_limiter = KeyedTokenBuckets(quota_units_per_second, burst)
+        else:
+            cls.user_rate_limiter = None
+
+    @classmethod
+    def set_http_pool_size(cls, size: Optional[int]):
+        """Share keep-alive connections to google across all clients in this process.
+
+        Args:
+            size (Optional[int]): max requests (and transports) at once, None (or 0)
+                gives every client its own transport
+        """
+        if cls.http_pool is not None:
+            cls.http_pool.clear()
+        if size:
+            cls.http_pool = PooledHttp(size)
+        else:
+            cls.http_pool = None
+
+    @classmethod
+    def get_http_pool_stats(cls) -> Optional[dict]:
+        """Connection reuse counters of the shared http pool, for logging"""
+        http_pool = cls.http_pool
+        if http_pool is not None:
+            return http_pool.stats()
+
+    @classmethod
+    def get_request_stats(cls) -> dict:
+        """Counters of gmail requests made by this process, for logging"""
+        with cls._request_stats_lock:
+            return dict(cls._request_stats)
+
+    @classmethod
+    def _count(cls, stat: str, value: float = 1):
+        with cls._request_stats_lock:
+            cls._request_stats[stat] += value
+
+    def _execute(self, request, retry: bool = True):
+        """Execute a googleapiclient request (or batch request), respecting
+        request_semaphore, user_rate_limiter and rate_limiter. Requests are charged
+        their full quota units, a batch may wait for more than a second's worth.
+
+        Requests gmail rate limits are retried REQUEST_MAX_RETRIES times, waiting for
+        the Retry-After header if gmail sends one. Set retry False for batch requests,
+        retry their failed sub-requests instead.
+        """
+        quota_units = get_quota_units(request)
+        attempt = 0
+        while True:
+            user_rate_limiter = self.user_rate_limiter
+            if user_rate_limiter is not None:
+                self._count(
+                    "rate_limit_wait_seconds",
+                    user_rate_limiter.acquire(self.user_key, quota_units),
+                )
+            rate_limiter = self.rate_limiter
+            if rate_limiter is not None:
+                self._count(
+                    "rate_limit_wait_seconds", rate_limiter.acquire(quota_units)
+                )
+            self._count("requests")
+            self._count("quota_units", quota_units)
+            try:
+                semaphore = self.request_semaphore
+                if semaphore is None:
+                    return request.execute()
+                with semaphore:
+                    return request.execute()
+            except HttpError as e:
+                if not is_rate_limit_error(e):
+                    raise
+                self._count("throttled")
+                attempt += 1
+                if not retry or attempt > self.REQUEST_MAX_RETRIES:
+                    raise
+                wait = get_retry_after(e)
+                if wait is None:
+                    wait = get_backoff(
+                        attempt,
+                        self.REQUEST_RETRY_BACKOFF_SECONDS,
+                        self.REQUEST_RETRY_MAX_BACKOFF_SECONDS,
+                    )
+                logger.info(
+                    f"Gmail rate limited {getattr(request, 'methodId', 'request')}, retrying in {wait:.1f}s."
+                )
+                self._count("retries")
+                time.sleep(wait)
 
     def get_gmail_service(self) -> Resource:
-        if self.gmail_service == None:
+        gmail_service = getattr(self._local, "gmail_service", None)
+        if gmail_service == None:
             if self.credentials == None:
                 logger.error("GmailClient object was not initialized with credentials.")
                 raise Exception(
                     "GmailClient object was not initialized with credentials."
                 )
-            self.gmail_service = build("gmail", "v1", credentials=self.credentials)
-        return self.gmail_service
+            discovery_document = self.get_discovery_document()
+            if self.http_pool is not None:
+                # authorized per request, the connections are shared
+                auth = {
+                    "http": google_auth_httplib2.AuthorizedHttp(
+                        self.credentials, http=self.http_pool
+                    )
+                }
+            else:
+                auth = {"credentials": self.credentials}
+            if discovery_document is not None:
+                gmail_service = build_from_document(discovery_document, **auth)
+            else:
+                gmail_service = build("gmail", "v1", **auth)
+            self._local.gmail_service = gmail_service
+        return gmail_service
+
+    @classmethod
+    def get_discovery_document(cls) -> Optional[str]:
+        """Gmail discovery document bundled with googleapiclient, so building a
+        service doesn't fetch it. None if this googleapiclient doesn't bundle them.
+        """
+        if cls.discovery_document is None and get_static_doc is not None:
+            cls.discovery_document = get_static_doc("gmail", "v1")
+        return cls.discovery_document
+
+    def get_refreshed_credentials_json(self) -> Optional[str]:
+        """Credentials as json if the access token was refreshed since the client was
+        created (or this was last called), so they can be saved for next time.
+        None otherwise.
+        """
+        token = getattr(self.credentials, "token", None)
+        if token is None or token == self._saved_token:
+            return None
+        self._saved_token = token
+        return self.credentials.to_json()
 
     def get_new_emails(self, history_id: str) -> Tuple[List[str], str]:
         """
         Returns new emails added since history_id and the current_history_id
         TODO: exception handling when history_list with given id returns a 404
         """
-        new_email_ids = []
-        current_history_id = None
+        new_emails = self.stream_new_emails(history_id)
+        new_email_ids = [new_email_id for page in new_emails for new_email_id in page]
+        return new_email_ids, new_emails.current_history_id
 
-        if history_id is None:
-            gmail_service = self.get_gmail_service()
-            two_weeks_ago = datetime.utcnow() - timedelta(
-                days=15
-            )  # 2weeks + 1day to be safe
-            query = f"after:{two_weeks_ago.strftime('%Y/%m/%d')}"
-
-            next_page_token = None
-            is_first = True
-            while next_page_token != None or is_first:
-                message_list_resp = (
+    def stream_new_emails(self, history_id: Optional[str]) -> NewEmailStream:
+        """Streaming version of get_new_emails, iterate over it for the new email ids
+        a page at a time. Its current_history_id is available once every page was read.
+        """
+        return NewEmailStream(self, history_id)
+
+    @staticmethod
+    def new_emails_query() -> str:
+        """Messages list query used when there is no history_id, emails from the past 2 weeks"""
+        two_weeks_ago = datetime.utcnow() - timedelta(
+            days=15
+        )  # 2weeks + 1day to be safe
+        return f"after:{two_weeks_ago.strftime('%Y/%m/%d')}"
+
+    def list_new_emails_page(
+        self,
+        history_id: Optional[str],
+        page_token: Optional[str] = None,
+        query: Optional[str] = None,
+    ) -> Tuple[List[str], Optional[str], Optional[str]]:
+        """Single page of get_new_emails.
+
+        Args:
+            history_id (Optional[str]): list emails added since history_id,
+                if None lists all emails matching query
+            page_token (Optional[str]): nextPageToken from the previous page, None for the first page
+            query (Optional[str]): messages list query when history_id is None,
+                defaults to new_emails_query(). Use the same query for every page.
+
+        Returns:
+            Tuple[List[str], Optional[str], Optional[str]]: message ids, next page token (None
+                on the last page) and current history id. Without history_id the current
+                history id is only returned with the first page.
+        """
+        if history_id is not None:
+            return self._list_history(history_id, page_token)
+
+        gmail_service = self.get_gmail_service()
+        current_history_id = None
+        message_list_resp = self._execute(
+            gmail_service.users()
+            .messages()
+            .list(
+                userId="me",
+                maxResults=500,
+                pageToken=page_token,
+                q=query if query is not None else self.new_emails_query(),
+                fields=self.LIST_MESSAGES_FIELDS,
+            )
+        )
+        next_page_token = message_list_resp.get("nextPageToken", None)
+        message_ids = list(
+            map(
+                lambda mess: mess.get("id"),
+                message_list_resp.get("messages", []),
+            )
+        )
+        if page_token is None:
+            ### To get the current history id, get message data for first message in inbox
+            ### See for more details: https://developers.google.com/gmail/api/guides/sync
+            if len(message_ids):
+                first_message_id = message_ids[0]
+                current_history_id = self._execute(
                     gmail_service.users()
                     .messages()
-                    .list(
+                    .get(
                         userId="me",
-                        maxResults=500,
-                        pageToken=next_page_token,
-                        q=query,
+                        id=first_message_id,
+                        format="minimal",
+                        fields="historyId",
                     )
-                    .execute()
-                )
-                next_page_token = message_list_resp.get("nextPageToken", None)
-                _message_ids = list(
-                    map(
-                        lambda mess: mess.get("id"),
-                        message_list_resp.get("messages", []),
-                    )
-                )
-                new_email_ids.extend(_message_ids)
-                if is_first:
-                    is_first = False
-                    ### To get the current history id, get message data for first message in inbox
-                    ### See for more details: https://developers.google.com/gmail/api/guides/sync
-                    if len(_message_ids):
-                        first_message_id = _message_ids[0]
-                        current_history_id = (
-                            gmail_service.users()
-                            .messages()
-                            .get(userId="me", id=first_message_id, format="minimal")
-                            .execute()
-                            .get("historyId")
-                        )
-        else:
-            is_first = True
-            next_page_token = None
-            while next_page_token != None or is_first:
-                (
-                    _new_email_ids,
-                    next_page_token,
-                    current_history_id,
-                ) = self._list_history(history_id, next_page_token)
-                new_email_ids.extend(_new_email_ids)
-                if is_first:
-                    is_first = False
-
-        return new_email_ids, current_history_id
+                ).get("historyId")
+        return message_ids, next_page_token, current_history_id
 
     def _list_history(
         self, history_id: str, page_token: str
@@ -101,7 +352,7 @@ class GoogleApiClient:
         """Return Tuple[message_ids, nextPageToken, currentHistoryId]"""
         gmail_service = self.get_gmail_service()
         message_ids = []
-        history_response = (
+        history_response = self._execute(
             gmail_service.users()
             .history()
             .list(
@@ -109,8 +360,8 @@ class GoogleApiClient:
                 startHistoryId=history_id,
                 pageToken=page_token,
                 historyTypes="messageAdded",
+                fields=self.LIST_HISTORY_FIELDS,
             )
-            .execute()
         )
         nextPageToken = history_response.get("nextPageToken")
         current_history_id = history_response.get("historyId")
@@ -123,23 +374,193 @@ class GoogleApiClient:
                     message_ids.append(message_added_id)
         return message_ids, nextPageToken, current_history_id
 
-    def get_email(self, gmail_message_id: str, format: str = "full") -> Optional[dict]:
+    def get_email(
+        self,
+        gmail_message_id: str,
+        format: str = "full",
+        metadata_headers: Optional[List[str]] = None,
+        fields: Optional[str] = None,
+    ) -> Optional[dict]:
+        """Get a gmail message, None if it doesn't exist.
+
+        Args:
+            gmail_message_id (str): id of the gmail message
+            format (str): gmail message format, see users.messages.get
+            metadata_headers (Optional[List[str]]): headers to include when format="metadata"
+            fields (Optional[str]): partial response field mask, defaults to
+                MESSAGE_FIELDS (METADATA_MESSAGE_FIELDS for format="metadata")
+        """
         gmail_service = self.get_gmail_service()
         try:
-            gmail_message = (
+            gmail_message = self._execute(
                 gmail_service.users()
                 .messages()
-                .get(userId="me", id=gmail_message_id, format=format)
-                .execute()
+                .get(
+                    userId="me",
+                    id=gmail_message_id,
+                    format=format,
+                    metadataHeaders=metadata_headers,
+                    fields=self._get_message_fields(format, fields),
+                )
             )
         except HttpError as e:
             if e.resp.status == 404:
                 return None
+            elif is_rate_limit_error(e):
+                # still rate limited after retrying, don't lose the message
+                raise
             else:
                 logger.error(f"Error getting email with exception", exc_info=HttpError)
                 return None
         return gmail_message
 
+    def get_emails(
+        self,
+        gmail_message_ids: List[str],
+        format: str = "full",
+        metadata_headers: Optional[List[str]] = None,
+        fields: Optional[str] = None,
+    ) -> List[Optional[dict]]:
+        """Bulk version of get_email using the gmail batch endpoint.
+
+        Ids are sent in batches of BATCH_MAX_SIZE. Sub-requests that fail with
+        anything other than a 404 are retried on their own (with jittered backoff),
+        up to BATCH_MAX_RETRIES times. Raises HttpError if messages are still rate
+        limited after that, rather than losing them.
+
+        Args:
+            gmail_message_ids (List[str]): ids of the gmail messages to get
+            format (str): gmail message format, see users.messages.get
+            metadata_headers (Optional[List[str]]): headers to include when format="metadata"
+            fields (Optional[str]): partial response field mask, see get_email
+
+        Returns:
+            List[Optional[dict]]: messages in the same order as gmail_message_ids,
+                None for messages that don't exist or couldn't be retrieved
+        """
+        gmail_service = self.get_gmail_service()
+        messages: List[Optional[dict]] = [None] * len(gmail_message_ids)
+        pending = list(range(len(gmail_message_ids)))
+        rate_limit_errors: Dict[int, HttpError] = {}
+        attempt = 0
+        while pending:
+            if attempt > 0:
+                if attempt > self.BATCH_MAX_RETRIES:
+                    logger.error(
+                        f"Failed getting {len(pending)} emails after {self.BATCH_MAX_RETRIES} retries."
+                    )
+                    for index in pending:
+                        if index in rate_limit_errors:
+                            raise rate_limit_errors[index]
+                    break
+                retry_after = max(
+                    (
+                        get_retry_after(rate_limit_errors[index]) or 0
+                        for index in pending
+                        if index in rate_limit_errors
+                    ),
+                    default=0,
+                )
+                time.sleep(
+                    retry_after
+                    or get_backoff(
+                        attempt,
+                        self.BATCH_RETRY_BACKOFF_SECONDS,
+                        self.REQUEST_RETRY_MAX_BACKOFF_SECONDS,
+                    )
+                )
+                self._count("retries", len(pending))
+            failed = []
+            for i in range(0, len(pending), self.BATCH_MAX_SIZE):
+                failed.extend(
+                    self._get_emails_batch(
+                        gmail_service,
+                        gmail_message_ids,
+                        pending[i : i + self.BATCH_MAX_SIZE],
+                        format,
+                        metadata_headers,
+                        self._get_message_fields(format, fields),
+                        messages,
+                        rate_limit_errors,
+                    )
+                )
+            pending = failed
+            attempt += 1
+        return messages
+
+    def _get_emails_batch(
+        self,
+        gmail_service: Resource,
+        gmail_message_ids: List[str],
+        indexes: List[int],
+        format: str,
+        metadata_headers: Optional[List[str]],
+        fields: Optional[str],
+        messages: List[Optional[dict]],
+        rate_limit_errors: Dict[int, HttpError],
+    ) -> List[int]:
+        """Run a single batch request for gmail_message_ids at the given indexes.
+
+        Retrieved messages are written into messages at their index, and rate limit
+        errors into rate_limit_errors.
+        Returns the indexes of the sub-requests that should be retried.
+        """
+        answered = set()
+        failed = []
+
+        def callback(request_id: str, response: dict, exception: Exception):
+            index = int(request_id)
+            answered.add(index)
+            rate_limit_errors.pop(index, None)
+            if exception is None:
+                messages[index] = response
+            elif isinstance(exception, HttpError) and exception.resp.status == 404:
+                messages[index] = None
+            elif is_rate_limit_error(exception):
+                self._count("throttled")
+                rate_limit_errors[index] = exception
+                failed.append(index)
+            else:
+                logger.warning(
+                    f"Error getting email with id: {gmail_message_ids[index]} in batch request",
+                    exc_info=exception,
+                )
+                failed.append(index)
+
+        batch = gmail_service.new_batch_http_request(callback=callback)
+        for index in indexes:
+            batch.add(
+                gmail_service.users()
+                .messages()
+                .get(
+                    userId="me",
+                    id=gmail_message_ids[index],
+                    format=format,
+                    metadataHeaders=metadata_headers,
+                    fields=fields,
+                ),
+                request_id=str(index),
+            )
+        try:
+            self._execute(batch, retry=False)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                for index in indexes:
+                    if index not in answered:
+                        rate_limit_errors[index] = e
+            logger.warning("Error executing gmail batch request", exc_info=e)
+            failed.extend(index for index in indexes if index not in answered)
+        return failed
+
+    def _get_message_fields(self, format: str, fields: Optional[str]) -> Optional[str]:
+        if fields is not None:
+            return fields
+        if format == "full":
+            return self.MESSAGE_FIELDS
+        if format == "metadata":
+            return self.METADATA_MESSAGE_FIELDS
+        return None
+
     def archive_email(self, gmail_message_id: str) -> Optional[dict]:
         """Archive (and mark as read) the given gmail message"""
         INBOX_LABEL = "INBOX"
@@ -147,11 +568,15 @@ class GoogleApiClient:
         MODIFY_REQUEST_BODY = {"removeLabelIds": [INBOX_LABEL, UNREAD_LABEL]}
         gmail_service = self.get_gmail_service()
         try:
-            archived_message = (
+            archived_message = self._execute(
                 gmail_service.users()
                 .messages()
-                .modify(userId="me", id=gmail_message_id, body=MODIFY_REQUEST_BODY)
-                .execute()
+                .modify(
+                    userId="me",
+                    id=gmail_message_id,
+                    body=MODIFY_REQUEST_BODY,
+                    fields="id,labelIds",
+                )
             )
         except HttpError as e:
             if e.resp.status == 404:
@@ -162,9 +587,12 @@ class GoogleApiClient:
         except Exception as e:
             pass
 
-    def get_user_profile(self) -> dict:
+    def get_user_profile(self, fields: Optional[str] = None) -> dict:
         """Get gmail user profile for the user with credentials associated to this object
 
+        Args:
+            fields (Optional[str]): partial response field mask, e.g. "emailAddress"
+
         Returns:
             dict: See http://googleapis.github.io/google-api-python-client/docs/dyn/gmail_v1.users.html#getProfile
             {
@@ -175,9 +603,15 @@ class GoogleApiClient:
             }
         """
         gmail_service = self.get_gmail_service()
-        profile = gmail_service.users().getProfile(userId="me").execute()
+        profile = self._execute(
+            gmail_service.users().getProfile(userId="me", fields=fields)
+        )
         return profile
 
+    def get_current_history_id(self) -> Optional[str]:
+        """Current historyId of the mailbox, a single lightweight getProfile call"""
+        return self.get_user_profile(fields="historyId").get("historyId")
+
     @staticmethod
     def get_email_from_address(gmail_message: str) -> Tuple[str, str]:
         """Get sender of an email given the email id.
@@ -309,11 +743,14 @@ class GoogleApiClient:
         return values
 
     @staticmethod
-    def init_api_client(credentials_json: str) -> GoogleApiClient:
+    def init_api_client(
+        credentials_json: str, user_key: Optional[Hashable] = None
+    ) -> GoogleApiClient:
         """Creates api client given credentials as json
 
         Args:
             credentials_json (str): User crendentials in json string
+            user_key (Optional[Hashable]): identifies the user, see set_user_rate_limit
 
         Returns:
             GoogleApiClient: GoogleApiClient
@@ -322,4 +759,48 @@ class GoogleApiClient:
         credentials = google.oauth2.credentials.Credentials.from_authorized_user_info(
             google.oauth2.credentials.json.loads(credentials_json)
         )
-        return GoogleApiClient(credentials)
+        return GoogleApiClient(credentials, user_key)
+
+
+class NewEmailStream(object):
+    """Pages of email ids added since history_id, see GoogleApiClient.stream_new_emails.
+
+    Pages are only listed as they're iterated over, so processing a page overlaps
+    with listing and only one page is held at a time. Iterate once.
+    """
+
+    def __init__(self, gmail_api_client: GoogleApiClient, history_id: Optional[str]):
+        self.gmail_api_client = gmail_api_client
+        self.history_id = history_id
+        # same query for every page when listing without a history_id
+        self.query = GoogleApiClient.new_emails_query() if history_id is None else None
+        self.is_exhausted = False
+        self._current_history_id: Optional[str] = None
+
+    def __iter__(self) -> Iterator[List[str]]:
+        is_first = True
+        next_page_token = None
+        while next_page_token != None or is_first:
+            (
+                new_email_ids,
+                next_page_token,
+                current_history_id,
+            ) = self.gmail_api_client.list_new_emails_page(
+                self.history_id, next_page_token, self.query
+            )
+            if current_history_id != None:
+                self._current_history_id = current_history_id
+            if is_first:
+                is_first = False
+            if new_email_ids:
+                yield new_email_ids
+        self.is_exhausted = True
+
+    @property
+    def current_history_id(self) -> Optional[str]:
+        """History id to record once the new emails are processed"""
+        if not self.is_exhausted:
+            raise RuntimeError(
+                "current_history_id is only available once every page was read"
+            )
+        return self._current_history_id
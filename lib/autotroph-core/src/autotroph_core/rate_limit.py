@@ -0,0 +1,137 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Hashable, Optional
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+# Gmail quota units per method, see https://developers.google.com/gmail/api/reference/quota
+GMAIL_QUOTA_UNITS: Dict[str, int] = {
+    "gmail.users.getProfile": 1,
+    "gmail.users.history.list": 2,
+    "gmail.users.messages.get": 5,
+    "gmail.users.messages.list": 5,
+    "gmail.users.messages.modify": 5,
+}
+DEFAULT_QUOTA_UNITS = 5
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class TokenBucket(object):
+    """Thread safe token bucket, refills at rate tokens per second up to capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Takes tokens, blocking until the bucket has refilled enough to pay for them.
+
+        Tokens are always charged in full, when there aren't enough (or asking for
+        more than capacity) the bucket goes into debt, which later callers wait for
+        as well. Callers are served in the order they asked.
+
+        Returns:
+            float: seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            self._tokens -= tokens
+            wait = max(-self._tokens / self.rate, 0.0)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def is_full(self) -> bool:
+        """Whether the bucket refilled to capacity, it's then the same as a new bucket"""
+        with self._lock:
+            elapsed = time.monotonic() - self._updated_at
+            return self._tokens + elapsed * self.rate >= self.capacity
+
+
+class KeyedTokenBuckets(object):
+    """A TokenBucket per key (like a user), created when the key is first used.
+
+    Buckets that refilled completely are dropped once there are more than
+    prune_size, so keys that aren't used anymore don't pile up.
+    """
+
+    def __init__(
+        self, rate: float, capacity: Optional[float] = None, prune_size: int = 1024
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.prune_size = prune_size
+        self._prune_at = prune_size
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Hashable, tokens: float = 1) -> float:
+        """TokenBucket.acquire on the key's bucket
+
+        Returns:
+            float: seconds spent waiting
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self._prune_at:
+                    self._prune()
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+        return bucket.acquire(tokens)
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _prune(self):
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if not bucket.is_full()
+        }
+        # buckets in use aren't pruned, don't try again on every new key
+        self._prune_at = max(self.prune_size, 2 * len(self._buckets))
+
+
+def get_quota_units(request) -> int:
+    """Gmail quota units used by a googleapiclient request, or batch request"""
+    batched_requests = getattr(request, "_requests", None)
+    if batched_requests is not None:
+        return sum(get_quota_units(r) for r in batched_requests.values())
+    return GMAIL_QUOTA_UNITS.get(
+        getattr(request, "methodId", None), DEFAULT_QUOTA_UNITS
+    )
+
+
+def is_rate_limit_error(exception: Exception) -> bool:
+    """Whether the exception is gmail asking us to slow down (429, or 403 rateLimitExceeded)"""
+    if not isinstance(exception, HttpError):
+        return False
+    if exception.resp.status == 429:
+        return True
+    if exception.resp.status == 403:
+        content = exception.content or b""
+        return any(reason.encode() in content for reason in RATE_LIMIT_REASONS)
+    return False
+
+
+def get_retry_after(exception: HttpError) -> Optional[float]:
+    """Seconds to wait from the Retry-After header, if there is one"""
+    try:
+        return float(exception.resp.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_backoff(attempt: int, base: float, maximum: float) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (starting at 1)"""
+    return random.uniform(0, min(maximum, base * 2 ** (attempt - 1)))
@@ -0,0 +1,95 @@
+import logging
+import threading
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+import httplib2
+
+logger = logging.getLogger(__name__)
+
+
+class PooledHttp(object):
+    """Thread safe stand in for httplib2.Http, shared by every GoogleApiClient in a process.
+
+    Each request borrows an httplib2.Http from the pool (at most size at once, more
+    requests wait), so keep-alive connections to google are reused by whichever
+    client makes the next request. Wrap it in google_auth_httplib2.AuthorizedHttp
+    to authorize requests with a user's credentials.
+    """
+
+    def __init__(self, size: int = 10, timeout: Optional[float] = 60):
+        self.size = size
+        self.timeout = timeout
+        # attributes google_auth_httplib2.AuthorizedHttp proxies
+        self.follow_redirects = True
+        self.redirect_codes = httplib2.REDIRECT_CODES
+
+        self._idle: List[httplib2.Http] = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "reused_connections": 0,
+            "new_connections": 0,
+            "transports": 0,
+        }
+
+    @property
+    def connections(self) -> dict:
+        """Open connections of the idle transports"""
+        with self._lock:
+            return {
+                key: conn
+                for http in self._idle
+                for key, conn in http.connections.items()
+            }
+
+    def request(self, uri: str, method: str = "GET", *args, **kwargs):
+        """Same as httplib2.Http.request"""
+        with self._slots:
+            http = self._checkout()
+            try:
+                reused = self._has_open_connection(http, uri)
+                response = http.request(uri, method, *args, **kwargs)
+            except Exception:
+                # don't hand out connections in an unknown state
+                http.close()
+                raise
+            finally:
+                self._checkin(http)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["reused_connections" if reused else "new_connections"] += 1
+        return response
+
+    def close(self):
+        """Does nothing, the pool is shared. See clear."""
+
+    def clear(self):
+        """Closes every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for http in idle:
+            http.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, size=self.size, idle=len(self._idle))
+
+    def _checkout(self) -> httplib2.Http:
+        with self._lock:
+            # most recently used first, its connections are the least likely to have timed out
+            if self._idle:
+                return self._idle.pop()
+            self._stats["transports"] += 1
+        return httplib2.Http(timeout=self.timeout)
+
+    def _checkin(self, http: httplib2.Http):
+        with self._lock:
+            self._idle.append(http)
+
+    @staticmethod
+    def _has_open_connection(http: httplib2.Http, uri: str) -> bool:
+        split = urlsplit(uri)
+        conn = http.connections.get(f"{split.scheme}:{split.netloc}")
+        return conn is not None and getattr(conn, "sock", None) is not None
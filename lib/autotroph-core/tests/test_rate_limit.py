@@ -0,0 +1,134 @@
+import pytest
+
+from autotroph_core import rate_limit
+from autotroph_core.google_api import GoogleApiClient
+from autotroph_core.rate_limit import KeyedTokenBuckets, TokenBucket
+
+
+class FakeClock(object):
+    """time.monotonic and time.sleep, sleeping moves the clock forward"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_takes_available_tokens_without_waiting(clock):
+    bucket = TokenBucket(10)
+
+    assert bucket.acquire(4) == 0
+    assert bucket.acquire(6) == 0
+    assert clock.sleeps == []
+
+
+def test_waits_for_refill(clock):
+    bucket = TokenBucket(10)
+    bucket.acquire(10)
+
+    assert bucket.acquire(5) == pytest.approx(0.5)
+
+    # 2 tokens refilled since
+    clock.now += 0.2
+    assert bucket.acquire(3) == pytest.approx(0.1)
+
+
+def test_charges_more_than_capacity_in_full(clock):
+    bucket = TokenBucket(10)
+
+    # a batch of 25 units on a bucket of 10, the 15 missing units take 1.5s
+    assert bucket.acquire(25) == pytest.approx(1.5)
+    # and the bucket isn't refilled by paying them off
+    assert bucket.acquire(10) == pytest.approx(1.0)
+
+
+def test_debt_makes_later_callers_wait(clock, monkeypatch):
+    bucket = TokenBucket(10)
+    # the first caller hasn't woken up yet when the second one asks
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda seconds: None)
+    assert bucket.acquire(20) == pytest.approx(1.0)
+
+    assert bucket.acquire(5) == pytest.approx(1.5)
+
+
+def test_is_full(clock):
+    bucket = TokenBucket(10)
+    assert bucket.is_full()
+
+    bucket.acquire(5)
+    assert not bucket.is_full()
+
+    clock.now += 0.5
+    assert bucket.is_full()
+
+
+def test_buckets_per_key(clock):
+    buckets = KeyedTokenBuckets(10)
+
+    assert buckets.acquire("alice", 10) == 0
+    assert buckets.acquire("bob", 10) == 0
+    assert buckets.acquire("alice", 5) == pytest.approx(0.5)
+    assert len(buckets) == 2
+
+
+def test_full_buckets_are_pruned(clock):
+    buckets = KeyedTokenBuckets(10, prune_size=2)
+    buckets.acquire("alice", 10)
+    buckets.acquire("bob", 1)
+    clock.now += 0.5
+
+    buckets.acquire("carol", 1)
+
+    # bob's bucket refilled, alice's is still in use
+    assert set(buckets._buckets) == {"alice", "carol"}
+
+
+class FakeRequest(object):
+    methodId = "gmail.users.messages.get"
+
+    def execute(self):
+        return {}
+
+
+@pytest.fixture
+def rate_limited(clock, monkeypatch):
+    monkeypatch.setattr(GoogleApiClient, "rate_limiter", None)
+    monkeypatch.setattr(GoogleApiClient, "user_rate_limiter", None)
+    GoogleApiClient.set_rate_limit(20)
+    GoogleApiClient.set_user_rate_limit(10)
+
+
+def test_clients_of_a_user_share_their_limit(rate_limited, clock):
+    first = GoogleApiClient(None, user_key=1)
+    second = GoogleApiClient(None, user_key=1)
+
+    first._execute(FakeRequest())
+    first._execute(FakeRequest())
+    second._execute(FakeRequest())
+
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_users_limited_separately_within_project_limit(rate_limited, clock):
+    clients = [GoogleApiClient(None, user_key=user_id) for user_id in range(3)]
+
+    for client in clients:
+        client._execute(FakeRequest())
+        client._execute(FakeRequest())
+
+    # no user went over their 10 units, the third user's 10 go over the project's 20
+    assert clock.sleeps == [pytest.approx(0.25), pytest.approx(0.25)]
@@ -0,0 +1,103 @@
+"""
+Benchmarks loading articles for a list view with and without a sparse fieldset.
+
+Adds newsletter sized articles for an existing user, in a transaction that is rolled
+back, then compares ContentManager.get_articles_by_id with every column against
+fields (load_only): time to query and serialize, and size of the JSON payload.
+
+Usage (with redwood-core and its requirements installed, against a dev database):
+    python benchmarks/bench_article_fields.py SQLALCHEMY_DATABASE_URI --user-id 1 \
+        [--articles 50] [--size-kb 200] [--repeat 5] [--fields title,source,author]
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from bench_transformers import best_of, newsletter_html
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from redwood_core.article import TransformerFactory
+from redwood_core.article.source import SourceType
+from redwood_core.factory import ManagerFactory
+from redwood_db.content import Article
+from redwood_db.user import User
+
+
+def add_articles(session, user: User, count: int, size_kb: int) -> list:
+    transformer = TransformerFactory({}).get_transformer(SourceType.GENERIC)
+    articles = []
+    for i in range(count):
+        html_content, outline, text_content = transformer.get_html_outline_and_text(
+            newsletter_html(size_kb, seed=i)
+        )
+        article = Article()
+        article.title = f"Benchmark newsletter {i}"
+        article.source = "bench@example.com"
+        article.author = "Benchmark"
+        article.outline = outline
+        article.text_content = text_content
+        article.html_content = html_content
+        article.gmail_message_id = f"bench-{time.time_ns()}-{i}"
+        article.user_id = user.id
+        article.message_received_at = datetime.utcnow()
+        articles.append(article)
+    session.add_all(articles)
+    session.flush()
+    return [article.id for article in articles]
+
+
+def list_payload(content_manager, user: User, article_ids: list, fields) -> str:
+    # nothing cached, every run reads from the database
+    content_manager.session.expunge_all()
+    articles = content_manager.get_articles_by_id(user, None, article_ids, fields)
+    return json.dumps(
+        {
+            "articles": [
+                content_manager.article_to_json(article, fields) for article in articles
+            ]
+        },
+        default=str,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database_uri")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--articles", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fields", default="title,source,author")
+    args = parser.parse_args()
+    fields = args.fields.split(",")
+
+    session = sessionmaker(bind=create_engine(args.database_uri))()
+    try:
+        user = session.query(User).get(args.user_id)
+        content_manager = ManagerFactory(session, {}).get_manager("content")
+        article_ids = add_articles(session, user, args.articles, args.size_kb)
+
+        for name, article_fields in (("all columns", None), ("fields", fields)):
+            payload = list_payload(content_manager, user, article_ids, article_fields)
+            seconds = best_of(
+                args.repeat,
+                list_payload,
+                content_manager,
+                user,
+                article_ids,
+                article_fields,
+            )
+            print(
+                f"{name:<12} {len(article_ids)} articles  "
+                f"payload: {len(payload) / 1024:10.1f} KB  "
+                f"query and serialize: {seconds * 1000:8.1f} ms"
+            )
+    finally:
+        session.rollback()
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
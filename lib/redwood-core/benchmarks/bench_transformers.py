@@ -0,0 +1,114 @@
+"""
+Benchmarks article html transformation on newsletter sized html.
+
+Compares the single pass AbstractTransformer.get_html_outline_and_text against
+parsing three times (transform_html, generate_outline, get_text), and checks the
+outputs are identical.
+
+Usage (with redwood-core and its requirements installed):
+    python benchmarks/bench_transformers.py [--size-kb 300] [--repeat 5] [--parser lxml]
+"""
+import argparse
+import random
+import time
+
+from redwood_core.article import TransformerFactory
+from redwood_core.article.source import SourceType
+
+SECTION_TEMPLATE = """
+<!--[if mso]><table role="presentation"><tr><td><![endif]-->
+<table class="section" width="100%" cellpadding="0" cellspacing="0" border="0">
+  <tr>
+    <td style="padding: 16px 24px; font-family: Georgia, serif; color: #333333;">
+      <h{level} class="header" id="s{i}">Section {i} &amp; friends &mdash; {word}</h{level}>
+      <p>{text}</p>
+      <p>Read <a href="https://example.com/{i}?utm_source=newsletter&amp;utm_medium=email">more</a>
+         about <b>{word}</b>&nbsp;and <i>other</i> things<br>on a new line.
+      <ul><li>{word} one</li><li>two &lt;three&gt;</li></ul>
+      <img src="https://example.com/img/{i}.png" alt="{word}" width="600">
+      <H3>Sub header {i}</H3>
+      <div><span>{text}</span><o:p></o:p></div>
+    </td>
+  </tr>
+</table>
+<!--[if mso]></td></tr></table><![endif]-->
+"""
+
+WORDS = (
+    "markets policy climate startups research science culture media "
+    "funding elections health energy design software"
+).split()
+
+
+def newsletter_html(size_kb: int, seed: int = 0) -> str:
+    """Email-like html (tables, inline styles, comments, entities) of about size_kb"""
+    rand = random.Random(seed)
+    sections = []
+    size = 0
+    i = 0
+    while size < size_kb * 1024:
+        text = " ".join(rand.choice(WORDS) for _ in range(rand.randint(40, 120)))
+        section = SECTION_TEMPLATE.format(
+            i=i, level=rand.choice([1, 2, 2, 3]), word=rand.choice(WORDS), text=text
+        )
+        sections.append(section)
+        size += len(section)
+        i += 1
+    return (
+        "<!DOCTYPE html><html><head><style>td {padding: 0}</style></head>"
+        f"<body><div class='wrapper'>{''.join(sections)}</div></body></html>"
+    )
+
+
+def three_pass(transformer, html_content: str):
+    transformed_html = transformer.transform_html(html_content)
+    outline = transformer.generate_outline(transformed_html)
+    text_content = transformer.get_text(transformed_html)
+    return transformed_html, outline, text_content
+
+
+def single_pass(transformer, html_content: str):
+    return transformer.get_html_outline_and_text(html_content)
+
+
+def best_of(repeat: int, fn, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-kb", type=int, nargs="+", default=[200, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--parser", default="html.parser")
+    args = parser.parse_args()
+
+    for source_type in (SourceType.GENERIC, SourceType.SUBSTACK):
+        for size_kb in args.size_kb:
+            html_content = newsletter_html(size_kb)
+            baseline = TransformerFactory({}).get_transformer(source_type)
+            transformer = TransformerFactory(
+                {"ARTICLE_HTML_PARSER": args.parser}
+            ).get_transformer(source_type)
+
+            if args.parser == "html.parser":
+                assert three_pass(baseline, html_content) == single_pass(
+                    transformer, html_content
+                ), "single pass output differs"
+
+            three_pass_s = best_of(args.repeat, three_pass, baseline, html_content)
+            single_pass_s = best_of(args.repeat, single_pass, transformer, html_content)
+            print(
+                f"{source_type.value:<9} {len(html_content) // 1024:>4} KB  "
+                f"three pass (html.parser): {three_pass_s * 1000:8.1f} ms  "
+                f"single pass ({args.parser}): {single_pass_s * 1000:8.1f} ms  "
+                f"speedup: {three_pass_s / single_pass_s:.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 
 from .content_manager import ContentManager
 from .factory import ManagerFactory
+from .schedule_manager import SyncScheduleManager
 from .triage_manager import TriageManager
 from .user_manager import UserManager
 
@@ -12,6 +13,7 @@ logger = logging.getLogger(__name__)
 
 for manager in [
     ("content", ContentManager),
+    ("schedule", SyncScheduleManager),
     ("triage", TriageManager),
     ("user", UserManager),
 ]:
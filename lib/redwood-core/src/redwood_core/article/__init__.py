@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import logging
 from abc import ABC, abstractmethod
 from typing import Tuple
 
-from bs4 import BeautifulSoup, PageElement, ResultSet
+from bs4 import BeautifulSoup, FeatureNotFound, PageElement, ResultSet
 
 from .source import SourceType
 
+logger = logging.getLogger(__name__)
+
 
 class TransformerFactory(object):
     def __init__(self, config: dict):
@@ -22,28 +25,57 @@ class TransformerFactory(object):
 
 
 class AbstractTransformer(ABC):
+    """Transforms email html into article html, outline and text
+
+    Config options available:
+        ARTICLE_HTML_PARSER, BeautifulSoup parser to use, "html.parser" (default) or "lxml".
+            lxml is faster but its output isn't identical to html.parser's
+    """
+
+    DEFAULT_HTML_PARSER = "html.parser"
+
     def __init__(self, config: dict):
         self.config = config
+        self.parser = config.get("ARTICLE_HTML_PARSER", self.DEFAULT_HTML_PARSER)
+
+    def get_html_outline_and_text(self, html_content: str) -> Tuple[str, str, str]:
+        """
+        Given email html content returns transformed html, matching outline and text to save.
+        The html is only parsed once, outline and text come from the transformed tree.
+        returns: [transformed_html, outline, text]
+        """
+        soup = self._parse(html_content)
+        self.transform_soup(soup)
+        return str(soup), self._generate_outline(soup), self._get_text(soup)
 
     def get_html_and_outline(self, html_content: str) -> Tuple[str, str]:
         """
         Given email html content returns transformed html and matching outline to save
         returns: [transformed_html, outline]
         """
-        transformed_html = self.transform_html(html_content)
-        outline = self.generate_outline(transformed_html)
+        transformed_html, outline, _ = self.get_html_outline_and_text(html_content)
         return transformed_html, outline
 
-    @abstractmethod
-    def transform_html(self, html_content: str):
+    def transform_html(self, html_content: str) -> str:
         """
         Returns html with the proper div's tagged with whittle_outline
         """
+        soup = self._parse(html_content)
+        self.transform_soup(soup)
+        return str(soup)
+
+    @abstractmethod
+    def transform_soup(self, soup: BeautifulSoup) -> None:
+        """
+        Tags the proper div's with whittle_outline, modifying soup in place
+        """
         pass
 
     def generate_outline(self, transformed_html: str):
+        return self._generate_outline(self._parse(transformed_html))
+
+    def _generate_outline(self, soup: BeautifulSoup) -> str:
         outline = ""
-        soup = BeautifulSoup(transformed_html, "html.parser")
         for header in soup.select(
             f".{self._class_name(1)}, .{self._class_name(2)}, .{self._class_name(3)}"
         ):
@@ -51,7 +83,7 @@ class AbstractTransformer(ABC):
                 list(
                     filter(
                         lambda _id: _id.startswith(f"{self._anchor_id('')}"),
-                        header.get("id", "").split(),
+                        self._split_attribute(header.get("id", "")),
                     )
                 )
                 + [""]
@@ -71,9 +103,27 @@ class AbstractTransformer(ABC):
         return outline
 
     def get_text(self, html_content: str) -> str:
-        soup = BeautifulSoup(html_content, "html.parser")
+        return self._get_text(self._parse(html_content))
+
+    def _get_text(self, soup: BeautifulSoup) -> str:
         return soup.get_text(" ", strip=True)
 
+    def _parse(self, html_content: str) -> BeautifulSoup:
+        try:
+            return BeautifulSoup(html_content, self.parser)
+        except FeatureNotFound:
+            logger.warning(
+                f"BeautifulSoup parser {self.parser} isn't installed, using {self.DEFAULT_HTML_PARSER}"
+            )
+            # only this transformer falls back, the shared config is left as is
+            self.parser = self.DEFAULT_HTML_PARSER
+            return BeautifulSoup(html_content, self.parser)
+
+    @staticmethod
+    def _split_attribute(value) -> list:
+        """Values of attributes set by transform_soup are lists, parsed ones are strings"""
+        return value if isinstance(value, list) else value.split()
+
     def _create_outline_h1(self, text: str, anchor_id: str):
         return f"##### [{text.strip()}](#{anchor_id})  \n\n"
 
@@ -93,13 +143,12 @@ class AbstractTransformer(ABC):
 
 
 class GenericTransformer(AbstractTransformer):
-    def transform_html(self, html_content: str):
-        """Returns html string with custom whittle tags/ids/etc.
+    def transform_soup(self, soup: BeautifulSoup) -> None:
+        """Adds custom whittle tags/ids/etc. to the parsed html
 
         Args:
-            html_content (str): original html from gmail message
+            soup (BeautifulSoup): original html from gmail message
         """
-        soup = BeautifulSoup(html_content, "html.parser")
         link_i = 0
         for header in soup.find_all(["h1", "h2", "h3"]):
             existing_class: list = header.get("class", [])
@@ -116,12 +165,10 @@ class GenericTransformer(AbstractTransformer):
                 header["class"] = existing_class + [f"{self._class_name(3)}"]
                 header["id"] = existing_id + [f"{self._anchor_id(str(link_i))}"]
                 link_i += 1
-        return str(soup)
 
 
 class SubstackTransformer(AbstractTransformer):
-    def transform_html(self, html_content: str):
-        soup = BeautifulSoup(html_content, "html.parser")
+    def transform_soup(self, soup: BeautifulSoup) -> None:
         link_i = 0
         for header in soup.find_all(["h1", "h2", "h3"]):
             existing_class: list = header.get("class", [])
@@ -138,4 +185,3 @@ class SubstackTransformer(AbstractTransformer):
                 header["class"] = existing_class + [f"{self._class_name(3)}"]
                 header["id"] = existing_id + [f"{self._anchor_id(str(link_i))}"]
                 link_i += 1
-        return str(soup)
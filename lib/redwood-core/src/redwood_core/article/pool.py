@@ -0,0 +1,189 @@
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from . import TransformerFactory
+from .source import SourceType
+
+logger = logging.getLogger(__name__)
+
+# Config keys passed on to transformers in worker processes
+TRANSFORMER_CONFIG_KEYS = ["ARTICLE_HTML_PARSER"]
+
+
+def transform_article_html(
+    config: dict, source_type: SourceType, html_content: str
+) -> Tuple[str, str, str]:
+    """Returns (html, outline, text) for html_content. Entry point in worker processes."""
+    transformer = TransformerFactory(config).get_transformer(source_type)
+    return transformer.get_html_outline_and_text(html_content)
+
+
+class TransformError(Exception):
+    """The html itself couldn't be transformed, transforming it again fails the same way"""
+
+
+class TransformTask(object):
+    """Pending article html transformation, see TransformerPool.submit"""
+
+    def __init__(
+        self,
+        source_type: SourceType,
+        html_content: str,
+        future: Future = None,
+        executor: ProcessPoolExecutor = None,
+    ):
+        self.source_type = source_type
+        self.html_content = html_content
+        self.future = future
+        # executor the task was submitted to, the pool's executor may have been replaced since
+        self.executor = executor
+
+
+class TransformerPool(object):
+    """Runs article html transformation in worker processes.
+
+    Transformation is pure CPU work, running it in other processes lets the
+    calling process keep fetching from gmail and writing to the database.
+    When there is no pool (disabled, failed to start, or broken) html is
+    transformed in the calling process instead, and so is every task the pool
+    doesn't return a result for. A worker that times out might be stuck, the
+    pool's processes are replaced so later tasks don't queue behind it.
+
+    Config options available:
+        ARTICLE_TRANSFORM_PROCESSES, number of worker processes, 0 (default) disables the pool
+        ARTICLE_TRANSFORM_TIMEOUT, seconds to wait for a single transform result (default 60)
+    """
+
+    DEFAULT_TIMEOUT = 60
+
+    def __init__(self, config: dict = {}):
+        self.transformer_config = {
+            key: config[key] for key in TRANSFORMER_CONFIG_KEYS if key in config
+        }
+        self.timeout = float(
+            config.get("ARTICLE_TRANSFORM_TIMEOUT") or self.DEFAULT_TIMEOUT
+        )
+        self.processes = int(config.get("ARTICLE_TRANSFORM_PROCESSES") or 0)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        if self.processes > 0:
+            self.executor = self._start_executor()
+
+    def submit(self, source_type: SourceType, html_content: str) -> TransformTask:
+        """Start transforming html_content, get the output with result()"""
+        task = TransformTask(source_type, html_content)
+        executor = self.executor
+        if executor is not None:
+            try:
+                task.future = executor.submit(
+                    transform_article_html,
+                    self.transformer_config,
+                    source_type,
+                    html_content,
+                )
+                task.executor = executor
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._disable(executor, e)
+        return task
+
+    def result(self, task: TransformTask) -> Tuple[str, str, str]:
+        """Returns (html, outline, text) for the task.
+
+        Transforms in the calling process when the worker process didn't return
+        a result (timed out, failed or the pool broke).
+
+        Raises:
+            TransformError: the html couldn't be transformed in the calling process either
+        """
+        if task.future is not None:
+            try:
+                return task.future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                logger.warning(
+                    f"Article transform timed out after {self.timeout}s, "
+                    "restarting the transformer pool and transforming in process"
+                )
+                self._restart(task.executor)
+            except BrokenProcessPool as e:
+                # tasks of a restarted executor break too, that's not the pool breaking
+                if task.executor is self.executor:
+                    self._disable(task.executor, e)
+            except Exception as e:
+                logger.warning(
+                    "Article transform failed in the transformer pool, transforming in process",
+                    exc_info=e,
+                )
+        try:
+            return transform_article_html(
+                self.transformer_config, task.source_type, task.html_content
+            )
+        except Exception as e:
+            raise TransformError(f"Couldn't transform article html: {e}") from e
+
+    def shutdown(self):
+        """Stops the worker processes, html is transformed in process afterwards"""
+        with self._lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _start_executor(self) -> Optional[ProcessPoolExecutor]:
+        try:
+            executor = ProcessPoolExecutor(max_workers=self.processes)
+            logger.info(
+                f"Started article transformer pool with {self.processes} processes"
+            )
+            return executor
+        except Exception as e:
+            logger.warning(
+                "Article transformer pool unavailable, transforming in process",
+                exc_info=e,
+            )
+
+    def _restart(self, executor: ProcessPoolExecutor):
+        """Replaces executor with a new one, its processes may be stuck on a task"""
+        with self._lock:
+            # another thread may have replaced it already
+            if executor is not self.executor:
+                return
+            self.executor = self._start_executor()
+        self._terminate(executor)
+
+    def _disable(self, executor: ProcessPoolExecutor, e: Exception):
+        with self._lock:
+            if executor is not self.executor:
+                return
+            self.executor = None
+        logger.error(
+            "Article transformer pool broke, transforming in process from now on",
+            exc_info=e,
+        )
+        executor.shutdown(wait=False)
+
+    @staticmethod
+    def _terminate(executor: ProcessPoolExecutor):
+        # shutdown doesn't stop running tasks, so the processes are terminated.
+        # Their pending tasks fail with BrokenProcessPool and are transformed in process.
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
+
+
+_transformer_pool: Optional[TransformerPool] = None
+_transformer_pool_lock = threading.Lock()
+
+
+def get_transformer_pool(config: dict) -> TransformerPool:
+    """Process wide TransformerPool, created from config on first use.
+
+    Processes are forked, so call this before starting other threads when possible.
+    """
+    global _transformer_pool
+    with _transformer_pool_lock:
+        if _transformer_pool is None:
+            _transformer_pool = TransformerPool(config)
+        return _transformer_pool
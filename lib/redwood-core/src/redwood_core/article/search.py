@@ -0,0 +1,36 @@
+import re
+from typing import List, Tuple
+
+# marks highlighted words in ts_headline output, removed from the text snippets are taken from
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+HIGHLIGHT_PATTERN = re.compile(f"{HIGHLIGHT_START}(.*?){HIGHLIGHT_STOP}", re.DOTALL)
+
+# ts_headline options for search result snippets
+SNIPPET_OPTIONS = (
+    f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, "
+    'MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" ... "'
+)
+
+
+def split_highlights(headline: str) -> Tuple[str, List[Tuple[int, int]]]:
+    """Splits ts_headline output into the snippet text and its highlights.
+
+    Returns:
+        Tuple[str, List[Tuple[int, int]]]: snippet, and (start, end) offsets of
+            each highlighted word in the snippet
+    """
+    parts = []
+    highlights = []
+    length = 0
+    position = 0
+    for match in HIGHLIGHT_PATTERN.finditer(headline):
+        before = headline[position : match.start()]
+        word = match.group(1)
+        parts.extend((before, word))
+        length += len(before)
+        highlights.append((length, length + len(word)))
+        length += len(word)
+        position = match.end()
+    parts.append(headline[position:])
+    return "".join(parts), highlights
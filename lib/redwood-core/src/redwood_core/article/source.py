@@ -1,5 +1,6 @@
 import re
 from enum import Enum
+from typing import Dict, List, Optional, Pattern, Tuple
 
 from redwood_db.content import Subscription
 
@@ -26,6 +27,129 @@ def is_newsletter_subscription(
         return True
 
 
+class SubscriptionMatcher(object):
+    """Matches a sender against a set of subscriptions, compiled once up front.
+
+    Most subscription from_address patterns are exact addresses (^addr$) or
+    domains (@domain), those are looked up in hash indexes. Only patterns that
+    are real regexes are matched, using a single combined regex.
+
+    Note, indexed patterns are matched literally, so the "." in ^hello@6pages.com$
+    only matches a ".", and @domain only matches addresses at exactly that domain.
+    """
+
+    EXACT_ADDRESS_PATTERN = re.compile(r"^\^([\w.+-]+@[\w.-]+)\$$")
+    DOMAIN_PATTERN = re.compile(r"^@([\w-]+(?:\.[\w-]+)+)$")
+    ANY_NAME_PATTERNS = ("", ".*")
+
+    def __init__(self, subscriptions: List[Subscription]):
+        # index key -> [(subscription, compiled name pattern or None for any name)]
+        self.exact_addresses: Dict[str, List[Tuple[Subscription, Pattern]]] = {}
+        self.domains: Dict[str, List[Tuple[Subscription, Pattern]]] = {}
+        self.regex_subscriptions: List[Tuple[Subscription, Pattern, Pattern]] = []
+        for subscription in subscriptions:
+            self._add(subscription)
+        self.combined_regex = self._combine_regexes()
+
+    def _add(self, subscription: Subscription):
+        name_pattern = subscription.name if subscription.name is not None else ".*"
+        compiled_name = (
+            None
+            if name_pattern in self.ANY_NAME_PATTERNS
+            else re.compile(name_pattern, re.IGNORECASE)
+        )
+        exact_match = self.EXACT_ADDRESS_PATTERN.match(subscription.from_address)
+        domain_match = self.DOMAIN_PATTERN.match(subscription.from_address)
+        if exact_match:
+            self.exact_addresses.setdefault(exact_match.group(1).lower(), []).append(
+                (subscription, compiled_name)
+            )
+        elif domain_match:
+            self.domains.setdefault(domain_match.group(1).lower(), []).append(
+                (subscription, compiled_name)
+            )
+        else:
+            self.regex_subscriptions.append(
+                (
+                    subscription,
+                    re.compile(subscription.from_address, re.IGNORECASE),
+                    re.compile(name_pattern, re.IGNORECASE),
+                )
+            )
+
+    def _combine_regexes(self) -> Optional[Pattern]:
+        """Single alternation of all from_address regexes, each in a group named by its index"""
+        if not self.regex_subscriptions:
+            return None
+        try:
+            return re.compile(
+                "|".join(
+                    f"(?P<s{i}>{from_address_regex.pattern})"
+                    for i, (_, from_address_regex, _) in enumerate(
+                        self.regex_subscriptions
+                    )
+                ),
+                re.IGNORECASE,
+            )
+        except re.error:
+            # e.g. patterns using numbered backreferences can't be combined
+            return None
+
+    def match(self, from_address: str, from_name: str) -> Optional[Subscription]:
+        """Returns a subscription matching the sender, None if there isn't one"""
+        from_address = from_address if from_address else ""
+        from_name = from_name if from_name else ""
+        address = from_address.lower()
+        for key, index in (
+            (address, self.exact_addresses),
+            (address.rpartition("@")[2], self.domains),
+        ):
+            for subscription, compiled_name in index.get(key, []):
+                if compiled_name is None or compiled_name.search(from_name):
+                    return subscription
+        return self._match_regexes(from_address, from_name)
+
+    def _match_regexes(
+        self, from_address: str, from_name: str
+    ) -> Optional[Subscription]:
+        if not self.regex_subscriptions:
+            return None
+        if self.combined_regex is not None:
+            combined_match = self.combined_regex.search(from_address)
+            if combined_match is None:
+                return None
+            subscription, _, compiled_name = self.regex_subscriptions[
+                int(combined_match.lastgroup[1:])
+            ]
+            if compiled_name.search(from_name):
+                return subscription
+        # fall back to checking every regex, another one might match the from name
+        for subscription, from_address_regex, compiled_name in self.regex_subscriptions:
+            if from_address_regex.search(from_address) and compiled_name.search(
+                from_name
+            ):
+                return subscription
+        return None
+
+
+def is_excluded_by_subjectline(from_name: str, from_address: str, title: str) -> bool:
+    """Should the message be excluded because of the subject line
+
+    For example: substack publishers get emails from the same from_name/from_address as their
+    actual newsletter, when someone simply subscribes. This will exclude creating an article
+    for substack addresses with "New signup" in the subjectline
+    """
+    from_address = "" if from_address is None else from_address.lower()
+    from_name = "" if from_name is None else from_name.lower()
+    title = "" if title is None else title.lower()
+    if "substack" in from_address:
+        if "new" in title and "signup" in title:
+            return True
+        elif "complete your signup" in title:
+            return True
+    return False
+
+
 def new_subscription(from_address: str, from_name: str = None):
     if from_name is None:
         from_name = ".*"
@@ -99,3 +223,5 @@ general_newsletter_subscriptions = [
     ),
     new_subscription(from_address="^newsletter@vox.com$"),
 ]
+
+general_newsletter_matcher = SubscriptionMatcher(general_newsletter_subscriptions)
@@ -0,0 +1,36 @@
+"""
+Rebuilds the box article counters from the active triages. Run after turning
+BOX_ARTICLE_COUNTERS on, since counters aren't kept up to date while it's off:
+
+    python -m redwood_core.box_counts SQLALCHEMY_DATABASE_URI
+"""
+import argparse
+import logging
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .factory import ManagerFactory
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuilds the box article counters from the active triages"
+    )
+    parser.add_argument("database_uri")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    session = sessionmaker(bind=create_engine(args.database_uri))()
+    try:
+        triage_manager = ManagerFactory(session, {}).get_manager("triage")
+        rebuilt = triage_manager.rebuild_box_article_counts()
+        session.commit()
+        logger.info(f"Rebuilt {rebuilt} box article counters")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache(object):
+    """Thread safe in process cache, entries expire ttl seconds after they're loaded.
+
+    Expired entries are dropped when they're looked up, and all of them at most once
+    every ttl seconds, so keys that aren't looked up again don't stay around.
+
+    Keeps hit and miss counters so cache effectiveness can be logged.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        # bumped by invalidate, a value loaded while its key was invalidated is stale
+        self._generations: Dict[Hashable, int] = {}
+        self._clears = 0
+        self._next_eviction = time.monotonic() + ttl
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, load: Callable[[], Any], ttl: Optional[float] = None):
+        """Returns the cached value for key, calling load() to (re)load it on a miss.
+
+        The loaded value isn't cached if the key was invalidated during load()
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            generation = self._generation(key)
+        value = load()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if self._generation(key) == generation:
+                self._entries[key] = (now + ttl, value)
+            self._evict_expired(now)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop the entry for key, or every entry if key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._generations.clear()
+                self._clears += 1
+            else:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def _generation(self, key: Hashable) -> Tuple[int, int]:
+        return self._clears, self._generations.get(key, 0)
+
+    def _evict_expired(self, now: float):
+        if now < self._next_eviction:
+            return
+        for key in [
+            key for key, (expires, _) in self._entries.items() if expires <= now
+        ]:
+            del self._entries[key]
+        self._next_eviction = now + self.ttl
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+
+# user id -> SubscriptionMatcher for the user's personal subscriptions
+subscription_matcher_cache = TTLCache()
+
+# user id -> (GoogleAuthCredential id, GoogleApiClient), see UserManager.get_gmail_api_client
+gmail_api_client_cache = TTLCache(ttl=15 * 60)
@@ -1,17 +1,26 @@
+import binascii
+import json
 import logging
-from datetime import datetime, timezone
-from typing import List, Optional
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
-from sqlalchemy import and_, exists
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import load_only
 
-from autotroph_core.google_api import GoogleApiClient
+from autotroph_core.google_api import GoogleApiClient, NewEmailStream
 from redwood_db.content import Article, Subscription
 from redwood_db.triage import Box, Triage
 from redwood_db.user import User, UserSubscription
 
-from .article import TransformerFactory
+from .article import search as search_utils
 from .article import source as source_utils
+from .article.pool import TransformError, TransformTask, get_transformer_pool
+from .cache import subscription_matcher_cache
 from .factory import ManagerFactory
+from .models import ArticleSearchDocument, GmailImportJob, GmailSyncCursor
 from .user_manager import UserManager
 
 logger = logging.getLogger(__name__)
@@ -22,9 +31,29 @@ class ContentManager(ManagerFactory):
 
     Config options available:
         BOX_PAGE_SIZE, number of articles in a single page for a box
+        ARTICLE_INSERT_BATCH_SIZE, number of gmail messages saved per bulk_create_articles_from_gmail batch
+        SUBSCRIPTION_CACHE_TTL, seconds a user's compiled subscriptions are cached for
+        SEARCH_RESULT_LIMIT, maximum number of articles a search returns
+        GMAIL_IMPORT_JOB_TIMEOUT, seconds after which an import job that didn't complete
+            is given up on, and the user is synced again (default 1 day)
 
     """
 
+    DEFAULT_ARTICLE_INSERT_BATCH_SIZE = 50
+    DEFAULT_BOX_PAGE_SIZE = 50
+    DEFAULT_SEARCH_RESULT_LIMIT = 100
+    DEFAULT_IMPORT_JOB_TIMEOUT = 24 * 60 * 60
+
+    # text search configuration of search documents and queries
+    SEARCH_CONFIG = "english"
+    # only the start of long articles is indexed, tsvectors are limited to 1MB
+    SEARCH_MAX_TEXT_LENGTH = 100000
+    # snippets are taken from the start of the text, kept with the search document
+    SEARCH_SNIPPET_TEXT_LENGTH = 10000
+
+    # Headers needed to decide if a gmail message is a newsletter
+    NEWSLETTER_METADATA_HEADERS = ["From", "Subject"]
+
     def get_new_emails(self, user: User) -> List[str]:
         """
         Returns message_ids for all emails since history_id.
@@ -34,105 +63,514 @@ class ContentManager(ManagerFactory):
         session so the session does need to be committed after calling this method.
         """
         user_manager = self.get_manager("user")
-        gmail_api_client = user_manager.get_gmail_api_client(user)
-        history_id = user_manager.get_latest_history_id(user)
-        latest_emails, current_history_id = gmail_api_client.get_new_emails(history_id)
+        latest_emails, current_history_id = self.list_new_emails(user)
         user_manager.create_history_id(user, current_history_id)
         return latest_emails
 
-    def is_email_newsletter(self, user: User, gmail_message_id: str) -> bool:
-        """Returns if the gmail message a newsletter that should be imported.
+    def list_new_emails(self, user: User) -> Tuple[List[str], str]:
+        """
+        Returns message_ids for all emails since history_id, and the current history_id.
+        Unlike get_new_emails the current history_id isn't added to the session.
+        """
+        user_manager = self.get_manager("user")
+        gmail_api_client = user_manager.get_gmail_api_client(user)
+        history_id = user_manager.get_latest_history_id(user)
+        return gmail_api_client.get_new_emails(history_id)
+
+    def has_new_emails(self, user: User) -> bool:
+        """
+        Cheap check for changes to the user's mailbox since the latest history_id,
+        without listing any history. Compares the stored history_id with the
+        mailbox's current one.
+
+        Returns True when there's no history_id yet or an unfinished sync to resume.
+        """
+        user_manager = self.get_manager("user")
+        history_id = user_manager.get_latest_history_id(user)
+        if history_id is None or self.get_sync_cursor(user) is not None:
+            return True
+        gmail_api_client = user_manager.get_gmail_api_client(user)
+        current_history_id = gmail_api_client.get_current_history_id()
+        if current_history_id is None:
+            return True
+        try:
+            return int(current_history_id) > int(history_id)
+        except ValueError:
+            return current_history_id != history_id
+
+    def get_new_email_pages(self, user: User) -> Iterator[List[str]]:
+        """
+        Yields message_ids for all emails since history_id, a page at a time.
+
+        Progress is checkpointed in the user's GmailSyncCursor. Once a page has been
+        processed (the caller asks for the next page) the cursor is moved past it and
+        flushed, so commit while processing each page. An interrupted sync resumes
+        from the last page that wasn't checkpointed, which may have been partly
+        imported already.
+
+        Once the last page has been processed the current history_id is added for
+        the user and the cursor removed, commit after the iteration finishes.
+        """
+        user_manager = self.get_manager("user")
+        gmail_api_client = user_manager.get_gmail_api_client(user)
+        history_id = user_manager.get_latest_history_id(user)
+
+        cursor = self.get_sync_cursor(user)
+        if cursor is not None and cursor.start_history_id != history_id:
+            # a history id was recorded since this cursor was created
+            self.session.delete(cursor)
+            self.session.flush()
+            cursor = None
+
+        is_resumed = cursor is not None
+        if is_resumed:
+            logger.info(
+                f"Resuming gmail sync for user_id={user.id} after message_id={cursor.last_message_id}"
+            )
+            has_next_page = cursor.page_token is not None or not cursor.pages_listed
+        else:
+            cursor = GmailSyncCursor()
+            cursor.user_id = user.id
+            cursor.start_history_id = history_id
+            if history_id is None:
+                cursor.list_query = GoogleApiClient.new_emails_query()
+            self.session.add(cursor)
+            self.session.flush()
+            has_next_page = True
+
+        while has_next_page:
+            try:
+                (
+                    message_ids,
+                    next_page_token,
+                    current_history_id,
+                ) = gmail_api_client.list_new_emails_page(
+                    cursor.start_history_id, cursor.page_token, cursor.list_query
+                )
+            except Exception:
+                if not is_resumed:
+                    raise
+                # the saved page token may have expired, list from the start again
+                logger.warning(
+                    f"Couldn't resume gmail sync for user_id={user.id}, restarting",
+                    exc_info=True,
+                )
+                is_resumed = False
+                cursor.page_token = None
+                cursor.pages_listed = 0
+                cursor.last_message_id = None
+                cursor.pending_history_id = None
+                continue
+            is_resumed = False
+
+            yield message_ids
+
+            # only moved past the page once it has been processed
+            if current_history_id is not None:
+                cursor.pending_history_id = current_history_id
+            cursor.page_token = next_page_token
+            cursor.pages_listed = (cursor.pages_listed or 0) + 1
+            if len(message_ids):
+                cursor.last_message_id = message_ids[-1]
+            self.session.add(cursor)
+            self.session.flush()
+            has_next_page = next_page_token is not None
+
+        user_manager.create_history_id(user, cursor.pending_history_id)
+        self.session.delete(cursor)
+        self.session.flush()
+
+    def get_sync_cursor(self, user: User) -> Optional[GmailSyncCursor]:
+        """Returns the cursor of the user's unfinished gmail sync, if any"""
+        return self.session.query(GmailSyncCursor).get(user.id)
+
+    def stream_new_emails(self, user: User) -> NewEmailStream:
+        """
+        Streaming version of list_new_emails, iterate over it for message_ids of all
+        emails since history_id a page at a time. Its current_history_id is available
+        once every page was read.
+        """
+        user_manager = self.get_manager("user")
+        gmail_api_client = user_manager.get_gmail_api_client(user)
+        history_id = user_manager.get_latest_history_id(user)
+        return gmail_api_client.stream_new_emails(history_id)
+
+    def create_import_job(
+        self,
+        user: User,
+        history_id: Optional[str] = None,
+        total_batches: Optional[int] = None,
+    ) -> GmailImportJob:
+        """Creates a record tracking an import split into total_batches batches.
+        Adds, and flushes, but does not commit the record.
+
+        The history_id is recorded for the user once every batch is completed,
+        see complete_import_batch. When the batches are published while the emails
+        are still being listed, leave total_batches and history_id out and set them
+        with finish_import_job.
+        """
+        import_job = GmailImportJob()
+        import_job.user_id = user.id
+        import_job.history_id = history_id
+        import_job.total_batches = total_batches
+        import_job.completed_batches = []
+        self.session.add(import_job)
+        self.session.flush()
+        return import_job
+
+    def has_open_import_job(self, user: User) -> bool:
+        """Whether an import job of the user is still running. The user's history_id is
+        only recorded once it completes, syncing the user before would import the
+        same emails again.
+
+        Jobs older than GMAIL_IMPORT_JOB_TIMEOUT are taken to have failed.
+        """
+        timeout = int(
+            self.config.get("GMAIL_IMPORT_JOB_TIMEOUT")
+            or self.DEFAULT_IMPORT_JOB_TIMEOUT
+        )
+        # created_at is set by the database, compare with its clock
+        started_after = func.now() - timedelta(seconds=timeout)
+        return self.session.query(
+            self.session.query(GmailImportJob)
+            .filter(GmailImportJob.user_id == user.id)
+            .filter(GmailImportJob.completed_at.is_(None))
+            .filter(GmailImportJob.created_at > started_after)
+            .exists()
+        ).scalar()
+
+    def complete_import_batch(self, import_job_id: int, batch_index: int) -> bool:
+        """Marks a batch of an import job as completed.
+
+        Locks the job record, so this is safe to call from concurrent workers, and
+        completing the same batch twice has no effect. When the last batch completes
+        the job's history_id is added for the user. Commit in the same transaction as
+        the batch's articles.
+
+        Returns:
+            bool: whether this completed the whole import job
+        """
+        import_job = self._get_import_job_for_update(import_job_id)
+        if import_job is None:
+            return False
+        if batch_index not in import_job.completed_batches:
+            import_job.completed_batches = import_job.completed_batches + [batch_index]
+        return self._complete_import_job_if_done(import_job)
+
+    def finish_import_job(
+        self, import_job_id: int, total_batches: int, history_id: Optional[str]
+    ) -> bool:
+        """Sets the number of batches and the history_id of an import job created
+        before its emails were all listed. Locks the job record like complete_import_batch,
+        so batches completed in the meantime are accounted for.
+
+        Returns:
+            bool: whether every batch was already completed, completing the import job
+        """
+        import_job = self._get_import_job_for_update(import_job_id)
+        if import_job is None:
+            return False
+        import_job.total_batches = total_batches
+        import_job.history_id = history_id
+        return self._complete_import_job_if_done(import_job)
+
+    def _get_import_job_for_update(
+        self, import_job_id: int
+    ) -> Optional[GmailImportJob]:
+        import_job: Optional[GmailImportJob] = (
+            self.session.query(GmailImportJob)
+            .filter_by(id=import_job_id)
+            .with_for_update()
+            .one_or_none()
+        )
+        if import_job is None:
+            logger.warning(f"Import job with id={import_job_id} doesn't exist.")
+        return import_job
+
+    def _complete_import_job_if_done(self, import_job: GmailImportJob) -> bool:
+        if (
+            import_job.completed_at is None
+            and import_job.total_batches is not None
+            and len(import_job.completed_batches) >= import_job.total_batches
+        ):
+            import_job.completed_at = datetime.now(tz=timezone.utc)
+            user_manager = self.get_manager("user")
+            user = self.session.query(User).get(import_job.user_id)
+            user_manager.create_history_id(user, import_job.history_id)
+            self.session.add(import_job)
+            self.session.flush()
+            return True
+        self.session.add(import_job)
+        self.session.flush()
+        return False
+
+    def get_newsletter_emails(
+        self, user: User, gmail_message_ids: List[str]
+    ) -> List[dict]:
+        """Returns the full gmail messages, out of gmail_message_ids, that should be imported.
+
+        Runs in stages so duplicates and non newsletters are never downloaded in full:
+            1. drops ids that already exist as articles for the user (single query)
+            2. classifies the rest from their From/Subject headers
+            3. bulk fetches full messages only for the newsletters
 
         Args:
             user (User):
-            gmail_message_id (str): gmail's id of email
+            gmail_message_ids (List[str]): gmail's ids of emails
 
         Returns:
-            bool: is email whittle newsletter
+            List[dict]: full format gmail messages, in the order of gmail_message_ids
         """
+        gmail_message_ids = list(dict.fromkeys(gmail_message_ids))
+        existing_ids = self.get_existing_gmail_message_ids(user, gmail_message_ids)
+        new_message_ids = [
+            gmail_message_id
+            for gmail_message_id in gmail_message_ids
+            if gmail_message_id not in existing_ids
+        ]
+        if not new_message_ids:
+            return []
+
         user_manager: UserManager = self.get_manager("user")
         gmail_api_client = user_manager.get_gmail_api_client(user)
-        gmail_message = gmail_api_client.get_email(gmail_message_id, format="metadata")
-        if gmail_message:
-            name, from_address = GoogleApiClient.get_email_from_address(gmail_message)
-            for subscription in source_utils.general_newsletter_subscriptions:
-                if source_utils.is_newsletter_subscription(
-                    from_address.lower() if from_address else from_address,
-                    name.lower() if name else name,
-                    subscription,
-                ):
-                    logger.info(
-                        f"GmailMessage from name: {name}, address: {from_address} is a generic subscription matching: {subscription}"
-                    )
-                    return True
-            for subscription in self.get_subscriptions_by_user(user):
-                if source_utils.is_newsletter_subscription(
-                    from_address.lower() if from_address else from_address,
-                    name.lower() if name else name,
-                    subscription,
-                ):
-                    logger.info(
-                        f"GmailMessage from name: {name}, address: {from_address} is a personal subscription matching: {subscription}"
-                    )
-                    return True
+        metadata_messages = gmail_api_client.get_emails(
+            new_message_ids,
+            format="metadata",
+            metadata_headers=self.NEWSLETTER_METADATA_HEADERS,
+        )
+        newsletter_ids = [
+            gmail_message["id"]
+            for gmail_message in metadata_messages
+            if gmail_message and self.is_gmail_message_newsletter(user, gmail_message)
+        ]
+        logger.info(
+            f"{user} {len(gmail_message_ids)} gmail messages, {len(existing_ids)} already imported, {len(newsletter_ids)} newsletters to import."
+        )
+        if not newsletter_ids:
+            return []
+        return list(filter(None, gmail_api_client.get_emails(newsletter_ids)))
+
+    def get_existing_gmail_message_ids(
+        self, user: User, gmail_message_ids: List[str]
+    ) -> Set[str]:
+        """Returns the subset of gmail_message_ids that already exist as articles for user"""
+        if not gmail_message_ids:
+            return set()
+        existing_ids = (
+            self.session.query(Article.gmail_message_id)
+            .filter_by(user_id=user.id)
+            .filter(Article.gmail_message_id.in_(gmail_message_ids))
+            .all()
+        )
+        return {gmail_message_id for (gmail_message_id,) in existing_ids}
+
+    def is_gmail_message_newsletter(self, user: User, gmail_message: dict) -> bool:
+        """Returns if the gmail message a newsletter that should be imported.
+
+        Args:
+            user (User):
+            gmail_message (dict): gmail message, with at least the From and Subject headers
+
+        Returns:
+            bool: is email whittle newsletter
+        """
+        sender = GoogleApiClient.get_email_from_address(gmail_message)
+        if not sender:
+            return False
+        name, from_address = sender
+        subject = GoogleApiClient.get_header_by_name(gmail_message, "Subject")
+        title = subject[0] if subject else None
+        if source_utils.is_excluded_by_subjectline(name, from_address, title):
+            logger.info(
+                f"{user} gmail message excluded due to subjectline. from_name: {name}, from_address: {from_address}, subject: {title}"
+            )
+            return False
+        subscription = source_utils.general_newsletter_matcher.match(from_address, name)
+        if subscription:
+            logger.info(
+                f"GmailMessage from name: {name}, address: {from_address} is a generic subscription matching: {subscription}"
+            )
+            return True
+        subscription = self.get_subscription_matcher(user).match(from_address, name)
+        if subscription:
+            logger.info(
+                f"GmailMessage from name: {name}, address: {from_address} is a personal subscription matching: {subscription}"
+            )
+            return True
         return False
 
-    def create_new_article_from_gmail(
-        self, user: User, gmail_message: dict
-    ) -> Optional[Article]:
-        """Retrieves email from gmail and saves data as new article record.
+    def bulk_create_articles_from_gmail(
+        self, user: User, gmail_messages: List[dict], read_to_library: bool = False
+    ) -> List[Tuple[dict, int]]:
+        """Saves a batch of gmail messages as new articles, with their initial triages.
+
+        Checks for existing articles with a single query, then inserts all article
+        records, and all triage records, with one statement each. Articles whose
+        gmail message id is inserted concurrently are skipped (ON CONFLICT DO NOTHING
+        on the unique user_id, gmail_message_id index, see redwood_core.migrate).
+        Executes but does not commit, commit once per batch.
 
         Args:
             user (User):
-            gmail_message_id (str):
-            move_to_library (bool): triage to library instead of inbox
+            gmail_messages (List[dict]): full format gmail messages
+            read_to_library (bool): triage messages that are already read to the library
+                instead of the inbox
 
         Returns:
-            (Article): newly added and flushed article record
+            List[Tuple[dict, int]]: (gmail message, article id) for each article created
+
+        Messages that can't become articles (no html, or html that can't be
+        transformed) are logged and skipped.
+
+        Raises:
+            Exception: transforming failed for another reason, roll back the batch
         """
-        tranformer_factory = TransformerFactory(self.config)
-        user_manager = self.get_manager("user")
-        gmail_message_id = gmail_message["id"]
-        title = GoogleApiClient.get_header_by_name(gmail_message, "Subject")[0]
-        from_name, from_address = GoogleApiClient.get_email_from_address(gmail_message)
-        source_type = source_utils.source_to_source_type(from_address)
-        transformer = tranformer_factory.get_transformer(source_type)
-        received_dt = GoogleApiClient.get_email_received_datetime(gmail_message)
-        received_dt = received_dt if received_dt else datetime.now(tz=timezone.utc)
-        html_body = GoogleApiClient.get_email_html_body(gmail_message)
-        if not html_body:
-            logger.error(
-                f"Can't create article from gmail_message: {gmail_message} because not html body"
+        pending = self._submit_transforms(user, gmail_messages)
+        if not pending:
+            return []
+
+        article_rows = []
+        for gmail_message, article_fields, transform_task in pending:
+            transformed = self._get_transform_result(
+                user, gmail_message, transform_task
             )
-        html_content, outline = transformer.get_html_and_outline(html_body)
-        text_content = transformer.get_text(html_content)
-        ((gmail_message_exists,),) = self.session.query(
-            exists().where(
-                and_(
-                    Article.gmail_message_id == gmail_message_id,
-                    Article.user_id == user.id,
-                )
+            if transformed is None:
+                continue
+            html_content, outline, text_content = transformed
+            article_rows.append(
+                {
+                    "title": article_fields["title"],
+                    "source": article_fields["source"],
+                    "author": article_fields["author"],
+                    "outline": outline,
+                    "text_content": text_content,
+                    "html_content": html_content,
+                    "gmail_message_id": article_fields["gmail_message_id"],
+                    "user_id": user.id,
+                    "message_received_at": article_fields["received_at"],
+                }
+            )
+        if not article_rows:
+            return []
+
+        inserted = self.session.execute(
+            postgresql.insert(Article.__table__)
+            .values(article_rows)
+            .on_conflict_do_nothing(
+                index_elements=[
+                    Article.__table__.c.user_id,
+                    Article.__table__.c.gmail_message_id,
+                ]
+            )
+            .returning(Article.__table__.c.id, Article.__table__.c.gmail_message_id)
+        ).fetchall()
+        article_ids = {
+            gmail_message_id: article_id for (article_id, gmail_message_id) in inserted
+        }
+        self.index_articles_for_search(list(article_ids.values()))
+        if len(article_ids) < len(article_rows):
+            logger.warning(
+                f"{user} {len(article_rows) - len(article_ids)} articles already existed when inserting."
             )
+
+        triage_manager = self.get_manager("triage")
+        inbox = triage_manager.get_user_inbox(user)
+        library = triage_manager.get_user_library(user) if read_to_library else None
+        created = []
+        triage_rows = []
+        for gmail_message, _, _ in pending:
+            article_id = article_ids.get(gmail_message["id"])
+            if article_id is None:
+                continue
+            box = (
+                library
+                if library and "UNREAD" not in gmail_message.get("labelIds", [])
+                else inbox
+            )
+            triage_rows.append(
+                {"box_id": box.id, "article_id": article_id, "is_active": True}
+            )
+            created.append((gmail_message, article_id))
+        if triage_rows:
+            self.session.execute(Triage.__table__.insert().values(triage_rows))
+            triage_manager.update_box_article_counts(
+                user.id, Counter(row["box_id"] for row in triage_rows)
+            )
+        return created
+
+    def get_article_insert_batch_size(self) -> int:
+        """Number of gmail messages to pass to bulk_create_articles_from_gmail at once"""
+        return int(
+            self.config.get("ARTICLE_INSERT_BATCH_SIZE")
+            or self.DEFAULT_ARTICLE_INSERT_BATCH_SIZE
         )
-        # TODO this logic should be in the is_email_newsletter function, not here
-        # Should the message be excluded because of the subject line
-        #   For example: substack publishers get emails from the same from_name/from_address as their
-        #   actual newsletter, when someone simply subscribes. This will exclude creating an article
-        #   for substack addresses with "New signup" in the subjectline
-        def do_exclude_by_subjectline(
-            from_name: str, from_address: str, title: str
-        ) -> bool:
-            from_address = "" if from_address is None else from_address.lower()
-            from_name = "" if from_name is None else from_name.lower()
-            title = "" if title is None else title.lower()
-            if "substack" in from_address:
-                if "new" in title and "signup" in title:
-                    return True
-                elif "complete your signup" in title:
-                    return True
-            return False
 
-        exclude_by_subjectline = do_exclude_by_subjectline(
+    def _submit_transforms(
+        self, user: User, gmail_messages: List[dict]
+    ) -> List[Tuple[dict, dict, TransformTask]]:
+        """Submits html transformation for gmail messages that should become articles.
+
+        Returns:
+            List[Tuple[dict, dict, TransformTask]]: (gmail message, article fields, transform task)
+        """
+        transformer_pool = get_transformer_pool(self.config)
+        existing_ids = self.get_existing_gmail_message_ids(
+            user, [gmail_message["id"] for gmail_message in gmail_messages]
+        )
+        pending = []
+        for gmail_message in gmail_messages:
+            article_fields = self._get_article_fields_from_gmail(
+                user, gmail_message, gmail_message["id"] in existing_ids
+            )
+            if article_fields:
+                existing_ids.add(gmail_message["id"])
+                transform_task = transformer_pool.submit(
+                    article_fields.pop("source_type"), article_fields.pop("html_body")
+                )
+                pending.append((gmail_message, article_fields, transform_task))
+        return pending
+
+    def _get_transform_result(
+        self, user: User, gmail_message: dict, transform_task: TransformTask
+    ) -> Optional[Tuple[str, str, str]]:
+        """(html, outline, text) for a submitted transform, None if the message's html
+        can't be transformed, retrying wouldn't change that.
+
+        Other failures are raised, so the batch fails and is retried instead of the
+        message being skipped for good.
+        """
+        try:
+            return get_transformer_pool(self.config).result(transform_task)
+        except TransformError as e:
+            logger.error(
+                f"{user} skipping gmail_message_id: {gmail_message['id']}, its html couldn't be transformed",
+                exc_info=e,
+            )
+            return None
+        except Exception:
+            logger.error(
+                f"{user} failed transforming html for gmail_message_id: {gmail_message['id']}"
+            )
+            raise
+
+    def _get_article_fields_from_gmail(
+        self, user: User, gmail_message: dict, gmail_message_exists: bool
+    ) -> Optional[dict]:
+        """Article fields for the gmail message, None if no article should be created for it.
+
+        Html isn't transformed here, the returned fields include source_type and html_body to do so.
+        """
+        gmail_message_id = gmail_message["id"]
+        subjects = GoogleApiClient.get_header_by_name(gmail_message, "Subject")
+        sender = GoogleApiClient.get_email_from_address(gmail_message)
+        if not subjects or not sender:
+            logger.warning(
+                f"{user} can't create article from gmail_message_id: {gmail_message_id} because it has no subject or sender"
+            )
+            return None
+        title = subjects[0]
+        from_name, from_address = sender
+        exclude_by_subjectline = source_utils.is_excluded_by_subjectline(
             from_name, from_address, title
         )
 
@@ -145,22 +583,23 @@ class ContentManager(ManagerFactory):
                 f"{user} attempting to create article, but was excluded due to subjectline. from_name: {from_name}, from_address: {from_address}, subject: {title}"
             )
         else:
-            new_article = self.create_new_article(
-                user,
-                title,
-                from_address,
-                author=from_name,
-                outline=outline,
-                text_content=text_content,
-                html_content=html_content,
-                gmail_message_id=gmail_message_id,
-                received_at=received_dt,
-            )
-            if new_article:
-                triage_manager = self.get_manager("triage")
-                box = triage_manager.get_user_inbox(user)
-                triage_manager.create_new_triage(new_article, box)
-                return new_article
+            received_dt = GoogleApiClient.get_email_received_datetime(gmail_message)
+            received_dt = received_dt if received_dt else datetime.now(tz=timezone.utc)
+            html_body = GoogleApiClient.get_email_html_body(gmail_message)
+            if not html_body:
+                logger.warning(
+                    f"{user} can't create article from gmail_message_id: {gmail_message_id} because it has no html body"
+                )
+                return None
+            return {
+                "title": title,
+                "source": from_address,
+                "author": from_name,
+                "gmail_message_id": gmail_message_id,
+                "received_at": received_dt,
+                "source_type": source_utils.source_to_source_type(from_address),
+                "html_body": html_body,
+            }
 
     def create_new_article(
         self,
@@ -198,14 +637,21 @@ class ContentManager(ManagerFactory):
         article.message_received_at = received_at
         self.session.add(article)
         self.session.flush()
+        self.index_articles_for_search([article.id])
         return article
 
-    def get_article_by_id(self, id, user: User = None) -> Optional[Article]:
+    def get_article_by_id(
+        self, id, user: User = None, fields: Optional[List[str]] = None
+    ) -> Optional[Article]:
         """
         Get article by id. If user is passed, only return an article if the user is the owner of the article.
+        If fields is passed, only those columns are loaded (see article_to_json).
         Return article if article exists, else None
         """
-        article: Optional[Article] = self.session.query(Article).get(id)
+        query = self.session.query(Article)
+        if fields is not None:
+            query = query.options(self._load_article_fields(fields))
+        article: Optional[Article] = query.get(id)
         if user:
             if article and article.user_id == user.id:
                 return article
@@ -218,84 +664,315 @@ class ContentManager(ManagerFactory):
             return article
 
     def get_articles_by_id(
-        self, user: User, box_id: int, article_ids: List[int]
+        self,
+        user: User,
+        box_id: int,
+        article_ids: List[int],
+        fields: Optional[List[str]] = None,
     ) -> List[Article]:
-        return (
+        """Gets the user's articles with the given ids.
+
+        Args:
+            user (User):
+            box_id (int): unused
+            article_ids (List[int]):
+            fields (Optional[List[str]]): only load these columns, the others (like
+                html_content) aren't read from the database. Serialize the articles
+                with article_to_json(article, fields). All columns by default
+
+        Raises:
+            ValueError: fields has a name that isn't an article column
+        """
+        query = (
             self.session.query(Article)
             .filter_by(user_id=user.id)
             .filter(Article.id.in_(article_ids))
-            .all()
         )
+        if fields is not None:
+            query = query.options(self._load_article_fields(fields))
+        return query.all()
 
-    def get_num_articles_by_box_id(self, user: User, box_id: int) -> int:
-        user_articles = self.session.query(Article.id).filter_by(user_id=user.id)
-        article_count = (
-            self.session.query(Triage.article_id)
-            .filter(Triage.article_id.in_(user_articles))
-            .filter_by(box_id=box_id)
-            .filter_by(is_active=True)
-            .count()
-        )
-        return article_count
+    def article_to_json(self, article: Article, fields: Optional[List[str]] = None):
+        """Article.to_json with only the id and the given fields, read straight from the
+        loaded columns (datetimes in ISO 8601), so the others aren't loaded
+        """
+        if fields is None:
+            return article.to_json()
+        article_json = {}
+        for field in dict.fromkeys(["id", *fields]):
+            value = getattr(article, field)
+            article_json[field] = (
+                value.isoformat() if isinstance(value, datetime) else value
+            )
+        return article_json
 
-    def get_articles_by_box_id(self, user: User, box_id: int) -> List[int]:
-        """Gets the article ids for the given box id and page.
+    def _load_article_fields(self, fields: List[str]):
+        columns = Article.__table__.columns
+        unknown_fields = [field for field in fields if field not in columns]
+        if unknown_fields:
+            raise ValueError(f"Unknown article fields: {', '.join(unknown_fields)}")
+        # the id is always needed to identify the article
+        return load_only(Article.id, *[getattr(Article, field) for field in fields])
+
+    def get_article_page_by_box_id(
+        self, user: User, box_id: int, cursor: Optional[str] = None
+    ) -> Tuple[List[int], Optional[str]]:
+        """Gets a page of BOX_PAGE_SIZE article ids for the given box. The inbox is
+        newest received first, the queue oldest triaged first (FIFO), and other boxes
+        newest triaged first (LIFO).
+
+        Pages are found with the box's sort key (message_received_at for the inbox,
+        when the article was triaged otherwise) rather than an offset, so later pages
+        are as fast as the first.
 
         Args:
             user (User): user requesting articles
             box_id (int): id of box articles in
+            cursor (Optional[str]): cursor returned with the previous page, None for the first page
+
+        Raises:
+            ValueError: if cursor isn't valid
 
         Returns:
-            List[Article]: list of article resources
+            Tuple[List[int], Optional[str]]: article ids and the cursor for the next page,
+                None if this is the last page
         """
-        user_articles = self.session.query(Article.id).filter_by(user_id=user.id)
         triage_manager = self.get_manager("triage")
         box = triage_manager.get_box_by_id(box_id)
-        if not box:
-            return []
-
-        base_query = (
-            self.session.query(Triage.article_id)
-            .filter(Triage.article_id.in_(user_articles))
-            .filter_by(box_id=box_id)
-            .filter_by(is_active=True)
-        )
+        if not box or box.user_id != user.id:
+            return [], None
+        page_size = int(self.config.get("BOX_PAGE_SIZE", self.DEFAULT_BOX_PAGE_SIZE))
 
         ## TODO change this to an actual value on the box record itself
-        if box.name and box.name.lower() == "inbox":
+        box_name = box.name.lower() if box.name else None
+        if box_name == "inbox":
             ## Received at time
-            article_ids = (
-                self.session.query(Article.id)
-                .filter(Article.id.in_(base_query))
-                .order_by(Article.message_received_at.desc())
-                .all()
+            sort_key, tiebreaker, descending = (
+                Article.message_received_at,
+                Article.id,
+                True,
             )
-        elif box.name and box.name.lower() == "queue":
+        elif box_name == "queue":
             ## FIFO
-            article_ids = base_query.order_by(Triage.created_at.asc()).all()
+            sort_key, tiebreaker, descending = Triage.created_at, Triage.id, False
         else:  # basically == elif box.name and box.name.lower() == "library":
             ## LIFO
-            article_ids = base_query.order_by(Triage.created_at.desc()).all()
-        return [article_id for (article_id,) in article_ids]
+            sort_key, tiebreaker, descending = Triage.created_at, Triage.id, True
+
+        query = (
+            self.session.query(Article.id, sort_key, tiebreaker)
+            .join(Triage, Triage.article_id == Article.id)
+            .filter(Article.user_id == user.id)
+            .filter(Triage.box_id == box_id)
+            .filter(Triage.is_active == True)
+        )
+        if cursor is not None:
+            after = tuple_(sort_key, tiebreaker)
+            last = tuple_(*self._decode_box_cursor(box_id, cursor))
+            query = query.filter(after < last if descending else after > last)
+        if descending:
+            query = query.order_by(sort_key.desc(), tiebreaker.desc())
+        else:
+            query = query.order_by(sort_key.asc(), tiebreaker.asc())
+        # one extra row tells if there's a next page
+        rows = query.limit(page_size + 1).all()
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            _, last_sort_key, last_tiebreaker = rows[-1]
+            next_cursor = self._encode_box_cursor(
+                box_id, last_sort_key, last_tiebreaker
+            )
+        return [article_id for (article_id, _, _) in rows], next_cursor
+
+    @staticmethod
+    def _encode_box_cursor(box_id: int, sort_key: datetime, tiebreaker: int) -> str:
+        cursor = {"box_id": box_id, "after": [sort_key.isoformat(), tiebreaker]}
+        return urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+    @staticmethod
+    def _decode_box_cursor(box_id: int, cursor: str) -> Tuple[datetime, int]:
+        try:
+            decoded = json.loads(urlsafe_b64decode(cursor.encode()))
+            sort_key, tiebreaker = decoded["after"]
+            if decoded["box_id"] != box_id:
+                raise ValueError("cursor is for another box")
+            return datetime.fromisoformat(sort_key), int(tiebreaker)
+        except (TypeError, KeyError, ValueError, binascii.Error) as e:
+            raise ValueError(f"Invalid box cursor: {cursor}") from e
 
     def get_articles_by_search_query(self, user: User, box_id: int, query: str):
-        user_articles = self.session.query(Article.id).filter_by(user_id=user.id)
-        article_ids = (
-            self.session.query(Triage.article_id)
-            .filter(Triage.article_id.in_(user_articles))
-            .filter_by(box_id=box_id)
-            .filter_by(is_active=True)
+        """Article ids in the given box matching the search query, best match first"""
+        return self.search_articles(user, query).get(box_id, [])
+
+    def search_articles(self, user: User, query: str) -> Dict[int, List[int]]:
+        """Searches all the user's boxes with one full text search query.
+
+        Args:
+            user (User):
+            query (str): words to search for
+
+        Returns:
+            Dict[int, List[int]]: box id -> matching article ids, best match first.
+                At most SEARCH_RESULT_LIMIT articles in total
+        """
+        matches = self._get_search_matches(user, query).all()
+        article_ids_by_box = {}
+        for box_id, article_id, _ in matches:
+            article_ids_by_box.setdefault(box_id, []).append(article_id)
+        return article_ids_by_box
+
+    def get_search_results(self, user: User, query: str) -> Dict[int, List[dict]]:
+        """Same as search_articles, with what's needed to list the results.
+
+        Everything comes from the search documents in one query, articles aren't loaded.
+
+        Returns:
+            Dict[int, List[dict]]: box id -> results, best match first. A result is
+                {"id", "title", "source", "snippet", "highlights": [(start, end), ...]},
+                highlights are offsets of the matched words in the snippet
+        """
+        matches = self._get_search_matches(user, query).subquery()
+        ts_query = func.plainto_tsquery(self.SEARCH_CONFIG, query)
+        results = (
+            self.session.query(
+                matches.c.box_id,
+                ArticleSearchDocument.article_id,
+                ArticleSearchDocument.title,
+                ArticleSearchDocument.source,
+                func.ts_headline(
+                    self.SEARCH_CONFIG,
+                    ArticleSearchDocument.snippet_text,
+                    ts_query,
+                    search_utils.SNIPPET_OPTIONS,
+                ),
+            )
+            .join(matches, matches.c.article_id == ArticleSearchDocument.article_id)
+            .order_by(matches.c.rank.desc(), ArticleSearchDocument.article_id.desc())
+            .all()
+        )
+        results_by_box = {}
+        for box_id, article_id, title, source, headline in results:
+            snippet, highlights = search_utils.split_highlights(headline or "")
+            results_by_box.setdefault(box_id, []).append(
+                {
+                    "id": article_id,
+                    "title": title,
+                    "source": source,
+                    "snippet": snippet,
+                    "highlights": highlights,
+                }
+            )
+        return results_by_box
+
+    def _get_search_matches(self, user: User, query: str):
+        """Query of (box id, article id, rank) of the best SEARCH_RESULT_LIMIT matches"""
+        limit = int(
+            self.config.get("SEARCH_RESULT_LIMIT", self.DEFAULT_SEARCH_RESULT_LIMIT)
+        )
+        ts_query = func.plainto_tsquery(self.SEARCH_CONFIG, query)
+        rank = func.ts_rank_cd(ArticleSearchDocument.document, ts_query)
+        return (
+            self.session.query(
+                Triage.box_id, ArticleSearchDocument.article_id, rank.label("rank")
+            )
+            .select_from(ArticleSearchDocument)
+            .join(Triage, Triage.article_id == ArticleSearchDocument.article_id)
+            .filter(ArticleSearchDocument.user_id == user.id)
+            .filter(ArticleSearchDocument.document.op("@@")(ts_query))
+            .filter(Triage.is_active == True)
+            .order_by(rank.desc(), ArticleSearchDocument.article_id.desc())
+            .limit(limit)
         )
 
-        matching_article_ids = (
-            self.session.query(Article.id)
-            .filter(Article.id.in_(article_ids))
-            .filter(
-                Article.title.ilike(f"%{query.lower()}%"),
-                Article.text_content.ilike(f"%{query.lower()}%"),
+    def index_articles_for_search(self, article_ids: List[int]):
+        """Creates, or updates, the search documents of the given articles.
+        The documents are built by the database, article text isn't loaded.
+        """
+        if not article_ids:
+            return
+        articles = self._get_search_documents().filter(Article.id.in_(article_ids))
+        self._insert_search_documents(articles)
+
+    def index_unindexed_articles(self, limit: int) -> int:
+        """Creates search documents for up to limit articles that don't have one,
+        like articles created before search was added.
+
+        Returns:
+            int: number of articles indexed
+        """
+        articles = (
+            self._get_search_documents()
+            .outerjoin(
+                ArticleSearchDocument,
+                ArticleSearchDocument.article_id == Article.id,
+            )
+            .filter(ArticleSearchDocument.article_id.is_(None))
+            .limit(limit)
+        )
+        return self._insert_search_documents(articles)
+
+    def _insert_search_documents(self, articles) -> int:
+        table = ArticleSearchDocument.__table__
+        columns = [
+            table.c.article_id,
+            table.c.user_id,
+            table.c.title,
+            table.c.source,
+            table.c.snippet_text,
+            table.c.document,
+        ]
+        insert = postgresql.insert(table).from_select(columns, articles.statement)
+        result = self.session.execute(
+            insert.on_conflict_do_update(
+                index_elements=[table.c.article_id],
+                set_={
+                    **{column.name: insert.excluded[column.name] for column in columns},
+                    "updated_at": func.now(),
+                },
+            )
+        )
+        return result.rowcount
+
+    def _get_search_documents(self):
+        """Query of the search document columns of articles, see _insert_search_documents"""
+        # without highlight markers, they'd be mistaken for highlights in snippets
+        snippet_text = func.translate(
+            func.coalesce(
+                func.left(Article.text_content, self.SEARCH_SNIPPET_TEXT_LENGTH), ""
+            ),
+            search_utils.HIGHLIGHT_START + search_utils.HIGHLIGHT_STOP,
+            "",
+        )
+        return self.session.query(
+            Article.id,
+            Article.user_id,
+            Article.title,
+            Article.source,
+            snippet_text,
+            self._get_search_document(),
+        )
+
+    def _get_search_document(self):
+        """tsvector expression of an article's search document"""
+
+        def weighted(text, weight: str):
+            return func.setweight(
+                func.to_tsvector(self.SEARCH_CONFIG, func.coalesce(text, "")), weight
             )
-        ).all()
-        return [article_id for (article_id,) in matching_article_ids]
+
+        return (
+            weighted(Article.title, "A")
+            .op("||")(
+                weighted(func.concat_ws(" ", Article.source, Article.author), "B")
+            )
+            .op("||")(
+                weighted(
+                    func.left(Article.text_content, self.SEARCH_MAX_TEXT_LENGTH), "C"
+                )
+            )
+        )
 
     def get_subscriptions_by_user(self, user: User):
         subscription_ids = (
@@ -309,6 +986,30 @@ class ContentManager(ManagerFactory):
             .all()
         )
 
+    def get_subscription_matcher(self, user: User) -> source_utils.SubscriptionMatcher:
+        """Compiled matcher for the user's personal subscriptions.
+
+        Matchers are cached per user (see SUBSCRIPTION_CACHE_TTL), and invalidated
+        when subscriptions change in this process.
+        """
+
+        def load_matcher():
+            # copies so the cached matcher doesn't hold on to records bound to this session
+            return source_utils.SubscriptionMatcher(
+                [
+                    Subscription(
+                        id=subscription.id,
+                        from_address=subscription.from_address,
+                        name=subscription.name,
+                    )
+                    for subscription in self.get_subscriptions_by_user(user)
+                ]
+            )
+
+        return subscription_matcher_cache.get(
+            user.id, load_matcher, ttl=self.config.get("SUBSCRIPTION_CACHE_TTL")
+        )
+
     def get_subscription_by_from_address(
         self, from_address: str
     ) -> Optional[Subscription]:
@@ -330,6 +1031,8 @@ class ContentManager(ManagerFactory):
         new_subscription.name = from_name
         self.session.add(new_subscription)
         self.session.flush()
+        # not tied to a user yet, but drop every cached matcher to be safe
+        subscription_matcher_cache.invalidate()
         return new_subscription
 
     def bookmark_article(self, article: Article) -> Article:
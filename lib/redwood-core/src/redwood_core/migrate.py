@@ -0,0 +1,145 @@
+"""
+Schema changes of redwood-core, run once per deploy before the services start:
+
+    python -m redwood_core.migrate SQLALCHEMY_DATABASE_URI
+
+Services never change the schema themselves, so startup doesn't take locks
+and several processes starting at once don't race each other. Every step is
+safe to run again.
+"""
+import argparse
+import logging
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from redwood_db.content import Article
+from redwood_db.triage import Triage
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Indexes on redwood-db tables that queries in redwood-core rely on, name -> columns.
+# Built concurrently, these tables are too big to block writes to while indexing
+INDEXES = {
+    # keyset pagination of boxes, see ContentManager.get_article_page_by_box_id
+    "ix_triages_active_box_id_created_at": (
+        f"{Triage.__tablename__} (box_id, created_at, id) WHERE is_active"
+    ),
+    "ix_triages_active_article_id": (
+        f"{Triage.__tablename__} (article_id) WHERE is_active"
+    ),
+    "ix_articles_user_id_message_received_at": (
+        f"{Article.__tablename__} (user_id, message_received_at, id)"
+    ),
+}
+
+# Columns added to redwood-core tables after they were first created, the defaults
+# are constants so adding them doesn't rewrite the table
+COLUMNS = [
+    f"ALTER TABLE {models.GmailSyncCursor.__tablename__} "
+    f"ADD COLUMN IF NOT EXISTS pages_listed INTEGER NOT NULL DEFAULT 0",
+]
+
+UNIQUE_INDEXES = {
+    # a gmail message is imported once per user, see ContentManager.bulk_create_articles_from_gmail
+    "ux_articles_user_id_gmail_message_id": (
+        f"{Article.__tablename__} (user_id, gmail_message_id)"
+    ),
+}
+
+
+def add_columns(engine: Engine):
+    """Adds the columns above to tables created before them"""
+    with engine.begin() as connection:
+        for statement in COLUMNS:
+            connection.execute(text(statement))
+
+
+def delete_duplicate_articles(engine: Engine):
+    """Deletes articles imported more than once for the same gmail message, keeping
+    the first, so the unique index on them can be built.
+
+    Their triages and search documents are deleted with them.
+    """
+    duplicates = (
+        f"SELECT id FROM (SELECT id, row_number() OVER "
+        f"(PARTITION BY user_id, gmail_message_id ORDER BY id) AS copy "
+        f"FROM {Article.__tablename__} WHERE gmail_message_id IS NOT NULL) AS copies "
+        f"WHERE copy > 1"
+    )
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                f"DELETE FROM {Triage.__tablename__} WHERE article_id IN ({duplicates})"
+            )
+        )
+        connection.execute(
+            text(
+                f"DELETE FROM {models.ArticleSearchDocument.__tablename__} "
+                f"WHERE article_id IN ({duplicates})"
+            )
+        )
+        deleted = connection.execute(
+            text(f"DELETE FROM {Article.__tablename__} WHERE id IN ({duplicates})")
+        ).rowcount
+    if deleted:
+        logger.info(
+            f"Deleted {deleted} duplicate articles, "
+            f"rebuild box article counters with redwood_core.box_counts"
+        )
+
+
+def create_indexes(engine: Engine):
+    """Builds the indexes above that don't exist yet, without locking out writes.
+
+    CREATE INDEX CONCURRENTLY can't run in a transaction, and leaves an invalid index
+    behind when it fails, so those are dropped and built again.
+    """
+    indexes = [(name, columns, "INDEX") for name, columns in INDEXES.items()] + [
+        (name, columns, "UNIQUE INDEX") for name, columns in UNIQUE_INDEXES.items()
+    ]
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        for name, columns, kind in indexes:
+            is_valid = connection.execute(
+                text(
+                    "SELECT pg_index.indisvalid FROM pg_index "
+                    "JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                    "WHERE pg_class.relname = :name"
+                ),
+                {"name": name},
+            ).scalar()
+            if is_valid:
+                continue
+            if is_valid is not None:
+                logger.info(f"Dropping invalid index {name}")
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            logger.info(f"Creating index {name}")
+            connection.execute(
+                text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {columns}")
+            )
+
+
+def migrate(engine: Engine):
+    """Brings the redwood-core schema up to date"""
+    logger.info("Creating redwood-core tables that don't exist yet")
+    models.create_tables(engine)
+    add_columns(engine)
+    delete_duplicate_articles(engine)
+    create_indexes(engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Schema changes of redwood-core, run once per deploy"
+    )
+    parser.add_argument("database_uri")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    migrate(create_engine(args.database_uri))
+
+
+if __name__ == "__main__":
+    main()
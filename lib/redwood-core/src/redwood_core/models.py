@@ -0,0 +1,131 @@
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, func
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.ext.declarative import declarative_base
+
+"""
+Tables used only by redwood-core (sync bookkeeping and the like).
+
+Shared models live in the redwood-db package. These have their own metadata,
+so they are created by redwood_core.migrate instead of redwood-db's migrations.
+"""
+
+Base = declarative_base()
+
+
+class GmailImportJob(Base):
+    """Initial gmail import that was split into batches, see ContentManager.create_import_job"""
+
+    __tablename__ = "gmail_import_jobs"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    # recorded as the user's history id once every batch is completed
+    history_id = Column(String)
+    # None while batches are still being published
+    total_batches = Column(Integer)
+    completed_batches = Column(ARRAY(Integer), nullable=False, default=list)
+    created_at = Column(DateTime, server_default=func.now())
+    completed_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<GmailImportJob id={self.id} user_id={self.user_id}>"
+
+
+class GmailSyncCursor(Base):
+    """Progress of a user's gmail sync, see ContentManager.get_new_email_pages"""
+
+    __tablename__ = "gmail_sync_cursors"
+
+    user_id = Column(Integer, primary_key=True)
+    # history id the sync started from, None when listing the past 2 weeks
+    start_history_id = Column(String)
+    # messages list query, used when start_history_id is None
+    list_query = Column(String)
+    # page to list next, None for the first page and once the last page was listed
+    page_token = Column(String)
+    # pages processed so far, tells the first page from the last when page_token is None
+    pages_listed = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_id = Column(String)
+    # recorded as the user's history id once the sync completes
+    pending_history_id = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<GmailSyncCursor user_id={self.user_id} page_token={self.page_token}>"
+
+
+class GmailSyncSchedule(Base):
+    """When a user's gmail is synced next, see SyncScheduleManager"""
+
+    __tablename__ = "gmail_sync_schedules"
+
+    user_id = Column(Integer, primary_key=True)
+    next_sync_at = Column(DateTime, nullable=False, index=True)
+    last_synced_at = Column(DateTime)
+    # moving average of new newsletters per hour
+    newsletter_rate = Column(Float, nullable=False, default=0.0)
+    # last time the user used the app
+    last_active_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<GmailSyncSchedule user_id={self.user_id} next_sync_at={self.next_sync_at}>"
+
+
+class GmailSyncLease(Base):
+    """Claim of a job instance on syncing a user, see SyncScheduleManager.claim_user"""
+
+    __tablename__ = "gmail_sync_leases"
+
+    user_id = Column(Integer, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<GmailSyncLease user_id={self.user_id} owner={self.owner}>"
+
+
+class BoxArticleCount(Base):
+    """Number of active articles in a box, see TriageManager.update_box_article_counts"""
+
+    __tablename__ = "box_article_counts"
+
+    box_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    article_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return (
+            f"<BoxArticleCount box_id={self.box_id} article_count={self.article_count}>"
+        )
+
+
+class ArticleSearchDocument(Base):
+    """Full text search document of an article, see ContentManager.search_articles"""
+
+    __tablename__ = "article_search_documents"
+    __table_args__ = (
+        Index(
+            "ix_article_search_documents_document", "document", postgresql_using="gin"
+        ),
+    )
+
+    article_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    # weighted title (A), source and author (B) and text content (C)
+    document = Column(TSVECTOR, nullable=False)
+    # copied from the article so search results don't load it
+    title = Column(String)
+    source = Column(String)
+    # start of the text content that snippets are taken from
+    snippet_text = Column(String)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ArticleSearchDocument article_id={self.article_id}>"
+
+
+def create_tables(bind):
+    """Create the tables above if they don't exist yet"""
+    Base.metadata.create_all(bind=bind, checkfirst=True)
@@ -0,0 +1,244 @@
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.dialects import postgresql
+
+from redwood_db.user import User
+
+from .factory import ManagerFactory
+from .models import GmailSyncLease, GmailSyncSchedule
+
+logger = logging.getLogger(__name__)
+
+
+class SyncScheduleManager(ManagerFactory):
+    """Decides when each user's gmail is synced.
+
+    Users that get newsletters often, or are using the app, are synced often and
+    dormant users rarely. Users without a schedule are due right away. Several
+    job instances can sync side by side, each owns a shard of the users and
+    claims a user (a lease that expires) before syncing them.
+
+    Config options available:
+        SYNC_MIN_INTERVAL, minimum seconds between syncs of a user (default 600)
+        SYNC_MAX_INTERVAL, maximum seconds between syncs of a user, caps the sync lag (default 21600)
+        SYNC_ACTIVE_WINDOW, seconds after the last app use a user counts as active (default 86400)
+        SYNC_ACTIVE_MAX_INTERVAL, maximum seconds between syncs of an active user (default 1800)
+        SYNC_SHARD_TAKEOVER_DELAY, seconds overdue before another shard syncs a user (default 1800)
+        SYNC_LEASE_SECONDS, seconds a claim on a user lasts unless renewed (default 900)
+
+    """
+
+    DEFAULT_INTERVALS = {
+        "SYNC_MIN_INTERVAL": 10 * 60,
+        "SYNC_MAX_INTERVAL": 6 * 60 * 60,
+        "SYNC_ACTIVE_WINDOW": 24 * 60 * 60,
+        "SYNC_ACTIVE_MAX_INTERVAL": 30 * 60,
+        "SYNC_SHARD_TAKEOVER_DELAY": 30 * 60,
+        "SYNC_LEASE_SECONDS": 15 * 60,
+    }
+
+    # weight of the latest sync in the newsletter rate moving average
+    RATE_SMOOTHING = 0.3
+
+    # last_active_at is only updated when older than this, saves a write per request
+    ACTIVITY_RESOLUTION = timedelta(minutes=5)
+
+    def get_schedule(self, user: User) -> Optional[GmailSyncSchedule]:
+        return self.session.query(GmailSyncSchedule).get(user.id)
+
+    def get_or_create_schedule(self, user: User) -> GmailSyncSchedule:
+        """The user's schedule, created due now if they don't have one yet.
+
+        Created with ON CONFLICT DO NOTHING, a schedule created concurrently (by
+        another job instance, or the app) is returned instead of failing.
+        """
+        schedule = self.get_schedule(user)
+        if schedule is None:
+            table = GmailSyncSchedule.__table__
+            self.session.execute(
+                postgresql.insert(table)
+                .values(
+                    user_id=user.id,
+                    next_sync_at=datetime.utcnow(),
+                    newsletter_rate=0.0,
+                )
+                .on_conflict_do_nothing(index_elements=[table.c.user_id])
+            )
+            schedule = self.get_schedule(user)
+        return schedule
+
+    def get_users_due_for_sync(
+        self,
+        users: List[User],
+        now: Optional[datetime] = None,
+        shard_index: int = 0,
+        shard_count: int = 1,
+    ) -> List[User]:
+        """Returns the users whose next sync is due, most overdue first.
+
+        With more than one shard, users of other shards are only returned once
+        they are overdue by SYNC_SHARD_TAKEOVER_DELAY (or have never been synced),
+        so users of a shard that isn't running still get synced. They come after
+        this shard's users, claim_user keeps them from being synced twice.
+        """
+        now = now or datetime.utcnow()
+        takeover_at = now - timedelta(
+            seconds=self._get_interval_config("SYNC_SHARD_TAKEOVER_DELAY")
+        )
+        next_sync_at_by_user_id = dict(
+            self.session.query(
+                GmailSyncSchedule.user_id, GmailSyncSchedule.next_sync_at
+            )
+            .filter(GmailSyncSchedule.user_id.in_([user.id for user in users]))
+            .all()
+        )
+
+        def is_due(user: User) -> bool:
+            next_sync_at = next_sync_at_by_user_id.get(user.id)
+            if next_sync_at is None:
+                return True
+            if self.get_user_shard(user.id, shard_count) == shard_index:
+                return next_sync_at <= now
+            return next_sync_at <= takeover_at
+
+        return sorted(
+            filter(is_due, users),
+            key=lambda user: (
+                self.get_user_shard(user.id, shard_count) != shard_index,
+                next_sync_at_by_user_id.get(user.id, datetime.min),
+            ),
+        )
+
+    @staticmethod
+    def get_user_shard(user_id: int, shard_count: int) -> int:
+        """Shard a user belongs to, stable across processes and runs"""
+        return zlib.crc32(str(user_id).encode()) % shard_count
+
+    def claim_user(self, user: User, owner: str) -> bool:
+        """Takes (or renews) the lease to sync the user's gmail for SYNC_LEASE_SECONDS.
+
+        Fails if another owner holds a lease that hasn't expired, leases of owners
+        that died expire and can be taken over. Commit right away so other
+        owners see the lease.
+
+        Returns:
+            bool: whether owner holds the lease
+        """
+        now = func.timezone("utc", func.statement_timestamp())
+        expires_at = now + timedelta(
+            seconds=self._get_interval_config("SYNC_LEASE_SECONDS")
+        )
+        lease_table = GmailSyncLease.__table__
+        claimed = self.session.execute(
+            postgresql.insert(lease_table)
+            .values(user_id=user.id, owner=owner, expires_at=expires_at)
+            .on_conflict_do_update(
+                index_elements=[lease_table.c.user_id],
+                set_={"owner": owner, "expires_at": expires_at},
+                where=or_(lease_table.c.expires_at < now, lease_table.c.owner == owner),
+            )
+            .returning(lease_table.c.user_id)
+        ).first()
+        return claimed is not None
+
+    def is_sync_due(self, user: User, now: Optional[datetime] = None) -> bool:
+        """Whether the user's sync is due, read from the database again.
+
+        Call after claim_user, another owner may have synced the user (and moved
+        their next sync) between finding them due and claiming them.
+        """
+        now = now or datetime.utcnow()
+        schedule = (
+            self.session.query(GmailSyncSchedule)
+            .populate_existing()
+            .filter_by(user_id=user.id)
+            .first()
+        )
+        return schedule is None or schedule.next_sync_at <= now
+
+    def release_user(self, user: User, owner: str):
+        """Gives up owner's lease on the user, commit afterwards"""
+        self.session.query(GmailSyncLease).filter_by(
+            user_id=user.id, owner=owner
+        ).delete(synchronize_session=False)
+        self.session.flush()
+
+    def record_sync(
+        self, user: User, new_newsletters: int, now: Optional[datetime] = None
+    ) -> GmailSyncSchedule:
+        """Updates the user's newsletter rate after a sync and schedules the next one.
+        Adds, and flushes, but does not commit the schedule.
+        """
+        now = now or datetime.utcnow()
+        schedule = self.get_or_create_schedule(user)
+        if schedule.last_synced_at is not None:
+            hours = (
+                max(
+                    (now - schedule.last_synced_at).total_seconds(),
+                    self._get_interval_config("SYNC_MIN_INTERVAL"),
+                )
+                / (60 * 60)
+            )
+            schedule.newsletter_rate = (
+                self.RATE_SMOOTHING * (new_newsletters / hours)
+                + (1 - self.RATE_SMOOTHING) * schedule.newsletter_rate
+            )
+        schedule.last_synced_at = now
+        schedule.next_sync_at = now + self.get_sync_interval(schedule, now)
+        self.session.add(schedule)
+        self.session.flush()
+        logger.debug(
+            f"Next sync for user_id={user.id} at {schedule.next_sync_at}, "
+            f"newsletter_rate={schedule.newsletter_rate:.3f}/h"
+        )
+        return schedule
+
+    def record_activity(self, user: User, now: Optional[datetime] = None) -> bool:
+        """Marks the user as active, pulling their next sync in if needed.
+        Adds, and flushes, but does not commit the schedule.
+
+        Returns:
+            bool: whether the schedule changed and needs to be committed
+        """
+        now = now or datetime.utcnow()
+        schedule = self.get_or_create_schedule(user)
+        if (
+            schedule.last_active_at is not None
+            and now - schedule.last_active_at < self.ACTIVITY_RESOLUTION
+        ):
+            return False
+        schedule.last_active_at = now
+        active_max_interval = timedelta(
+            seconds=self._get_interval_config("SYNC_ACTIVE_MAX_INTERVAL")
+        )
+        if schedule.next_sync_at > now + active_max_interval:
+            schedule.next_sync_at = now + active_max_interval
+        self.session.add(schedule)
+        self.session.flush()
+        return True
+
+    def get_sync_interval(
+        self, schedule: GmailSyncSchedule, now: Optional[datetime] = None
+    ) -> timedelta:
+        """Time until the next sync, about the time it takes to get one newsletter"""
+        now = now or datetime.utcnow()
+        min_interval = self._get_interval_config("SYNC_MIN_INTERVAL")
+        max_interval = self._get_interval_config("SYNC_MAX_INTERVAL")
+        if schedule.newsletter_rate > 0:
+            interval = (60 * 60) / schedule.newsletter_rate
+        else:
+            interval = max_interval
+        if schedule.last_active_at is not None and (
+            now - schedule.last_active_at
+        ).total_seconds() < self._get_interval_config("SYNC_ACTIVE_WINDOW"):
+            interval = min(
+                interval, self._get_interval_config("SYNC_ACTIVE_MAX_INTERVAL")
+            )
+        return timedelta(seconds=min(max(interval, min_interval), max_interval))
+
+    def _get_interval_config(self, key: str) -> float:
+        return float(self.config.get(key, self.DEFAULT_INTERVALS[key]))
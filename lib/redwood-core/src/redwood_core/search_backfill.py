@@ -0,0 +1,55 @@
+"""
+Creates search documents for articles that don't have one yet, like articles
+created before search was added. Run once after deploying search, or whenever
+search documents need to be rebuilt for articles missing them:
+
+    python -m redwood_core.search_backfill SQLALCHEMY_DATABASE_URI [--batch-size 1000]
+
+Articles are indexed a batch per transaction, so the backfill can be stopped
+and run again at any point.
+"""
+import argparse
+import logging
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .factory import ManagerFactory
+
+logger = logging.getLogger(__name__)
+
+
+def backfill(session, batch_size: int) -> int:
+    """Indexes articles without a search document until there are none left
+
+    Returns:
+        int: number of articles indexed
+    """
+    content_manager = ManagerFactory(session, {}).get_manager("content")
+    total = 0
+    while True:
+        indexed = content_manager.index_unindexed_articles(batch_size)
+        session.commit()
+        if not indexed:
+            return total
+        total += indexed
+        logger.info(f"Indexed {total} articles for search")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Creates search documents for articles that don't have one"
+    )
+    parser.add_argument("database_uri")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    session = sessionmaker(bind=create_engine(args.database_uri))()
+    try:
+        backfill(session, args.batch_size)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
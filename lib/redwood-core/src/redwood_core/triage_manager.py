@@ -1,7 +1,9 @@
 import logging
-from typing import Optional
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
 
 from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
 
 from redwood_db.content import Article
 from redwood_db.triage import Box, Triage
@@ -9,11 +11,22 @@ from redwood_db.user import User
 
 from .content_manager import ContentManager
 from .factory import ManagerFactory
+from .models import BoxArticleCount
 
 logger = logging.getLogger(__name__)
 
 
 class TriageManager(ManagerFactory):
+    """Manages boxes and the triage of articles into them
+
+    Config options available:
+        BOX_ARTICLE_COUNTERS, keep box article counts in box_article_counts and read
+            them from there instead of counting triages (default False). Turn on in
+            every service that triages articles, then rebuild the counters with
+            python -m redwood_core.box_counts, see rebuild_box_article_counts
+
+    """
+
     def get_box_by_id(self, id: int) -> Box:
         return self.session.query(Box).get(id)
 
@@ -39,8 +52,131 @@ class TriageManager(ManagerFactory):
     def get_boxes_for_user(self, user: User):
         return self.session.query(Box).filter_by(user_id=user.id).all()
 
+    def get_article_counts_by_box(self, user: User, boxes: List[Box]) -> Dict[int, int]:
+        """Number of active articles in each of the given boxes, by box id.
+
+        With BOX_ARTICLE_COUNTERS on the counts are read from box_article_counts,
+        boxes without a counter yet are counted. Otherwise every box is counted
+        with one grouped query.
+        """
+        box_ids = [box.id for box in boxes]
+        if not box_ids:
+            return {}
+        counts = {}
+        if self.config.get("BOX_ARTICLE_COUNTERS", False):
+            counts = dict(
+                self.session.query(
+                    BoxArticleCount.box_id, BoxArticleCount.article_count
+                )
+                .filter(BoxArticleCount.box_id.in_(box_ids))
+                .all()
+            )
+        missing_box_ids = [box_id for box_id in box_ids if box_id not in counts]
+        if missing_box_ids:
+            counts.update(self._count_articles_by_box(user.id, missing_box_ids))
+        return counts
+
+    def update_box_article_counts(self, user_id: int, deltas: Dict[int, int]):
+        """Adds deltas (box id -> change in active articles) to the box counters,
+        if BOX_ARTICLE_COUNTERS is on.
+
+        Call after the triages were flushed, in the same transaction. A box without
+        a counter gets one with its current count, which already includes the change.
+        """
+        if not self.config.get("BOX_ARTICLE_COUNTERS", False):
+            return
+        for box_id, delta in deltas.items():
+            if not delta:
+                continue
+            updated = (
+                self.session.query(BoxArticleCount)
+                .filter_by(box_id=box_id)
+                .update(
+                    {
+                        BoxArticleCount.article_count: BoxArticleCount.article_count
+                        + delta,
+                        BoxArticleCount.updated_at: func.now(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if updated:
+                continue
+            count = self._count_articles_by_box(user_id, [box_id])[box_id]
+            table = BoxArticleCount.__table__
+            # another transaction may create the counter first, its count doesn't
+            # include this change yet
+            self.session.execute(
+                postgresql.insert(table)
+                .values(box_id=box_id, user_id=user_id, article_count=count)
+                .on_conflict_do_update(
+                    index_elements=[table.c.box_id],
+                    set_={
+                        "article_count": table.c.article_count + delta,
+                        "updated_at": func.now(),
+                    },
+                )
+            )
+
+    def rebuild_box_article_counts(self) -> int:
+        """Sets every box counter to the box's current count of active articles.
+
+        Counters aren't kept up to date while BOX_ARTICLE_COUNTERS is off, rebuild
+        them after turning it on, or after articles were deleted directly.
+
+        Returns:
+            int: number of counters rebuilt
+        """
+        table = BoxArticleCount.__table__
+        counts = (
+            self.session.query(
+                Triage.box_id, Article.user_id, func.count(Triage.id).label("count")
+            )
+            .join(Article, Article.id == Triage.article_id)
+            .filter(Triage.is_active == True)
+            .group_by(Triage.box_id, Article.user_id)
+        )
+        # boxes without active articles don't show up in the counts
+        self.session.query(BoxArticleCount).filter(
+            BoxArticleCount.box_id.notin_(counts.with_entities(Triage.box_id))
+        ).update(
+            {
+                BoxArticleCount.article_count: 0,
+                BoxArticleCount.updated_at: func.now(),
+            },
+            synchronize_session=False,
+        )
+        insert = postgresql.insert(table).from_select(
+            [table.c.box_id, table.c.user_id, table.c.article_count], counts.statement
+        )
+        return self.session.execute(
+            insert.on_conflict_do_update(
+                index_elements=[table.c.box_id],
+                set_={
+                    "article_count": insert.excluded.article_count,
+                    "updated_at": func.now(),
+                },
+            )
+        ).rowcount
+
+    def _count_articles_by_box(
+        self, user_id: int, box_ids: Iterable[int]
+    ) -> Dict[int, int]:
+        counts = dict.fromkeys(box_ids, 0)
+        counts.update(
+            self.session.query(Triage.box_id, func.count(Triage.id))
+            .join(Article, Article.id == Triage.article_id)
+            .filter(Article.user_id == user_id)
+            .filter(Triage.box_id.in_(counts))
+            .filter(Triage.is_active == True)
+            .group_by(Triage.box_id)
+            .all()
+        )
+        return counts
+
     def create_new_triage(self, article: Article, box: Box):
         """Create new triage record and set old ones as inactive"""
+        box_deltas = Counter({box.id: 1})
         for triage in (
             self.session.query(Triage)
             .filter_by(article_id=article.id)
@@ -50,6 +186,7 @@ class TriageManager(ManagerFactory):
             triage: Triage
             triage.is_active = False
             self.session.add(triage)
+            box_deltas[triage.box_id] -= 1
         # move the article to the correct box
         new_triage = Triage()
         new_triage.box_id = box.id
@@ -57,6 +194,7 @@ class TriageManager(ManagerFactory):
         new_triage.is_active = True
         self.session.add(new_triage)
         self.session.flush()
+        self.update_box_article_counts(article.user_id, box_deltas)
         return new_triage
 
     def triage_article(self, user: User, article_id: int, box_id: int):
@@ -79,6 +217,7 @@ class TriageManager(ManagerFactory):
                     try:
                         gmail_api_client = user_manager.get_gmail_api_client(user)
                         gmail_api_client.archive_email(article.gmail_message_id)
+                        user_manager.save_refreshed_gmail_credentials(user)
                     except Exception as e:
                         logger.error(
                             f"Error when trying to archive {article}", exc_info=e
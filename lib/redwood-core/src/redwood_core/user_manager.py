@@ -11,6 +11,7 @@ from redwood_db.content import Subscription
 from redwood_db.google import GoogleAuthCredential, GoogleAuthState, GoogleHistoryId
 from redwood_db.user import User, UserConfig, UserSubscription
 
+from .cache import gmail_api_client_cache, subscription_matcher_cache
 from .factory import ManagerFactory
 from .outcome_codes import OutcomeCodes
 
@@ -18,6 +19,13 @@ logger = logging.getLogger(__name__)
 
 
 class UserManager(ManagerFactory):
+    """Manages users, their config and google accounts
+
+    Config options available:
+        GMAIL_CLIENT_CACHE_TTL, seconds a user's GoogleApiClient is cached for
+
+    """
+
     PW_SALT = bcrypt.gensalt(rounds=12)
 
     def get_users_with_gmail_permissions(self) -> List[User]:
@@ -63,19 +71,33 @@ class UserManager(ManagerFactory):
             user_subscription.is_active = True
             self.session.add(user_subscription)
             self.session.flush()
+            subscription_matcher_cache.invalidate(user.id)
             return user_subscription
 
     def get_latest_history_id(self, user: User) -> Optional[str]:
-        history_id_record = (
+        history_id_record = self._get_latest_history_id_record(user)
+        if history_id_record:
+            return history_id_record.history_id
+
+    def _get_latest_history_id_record(self, user: User) -> Optional[GoogleHistoryId]:
+        return (
             self.session.query(GoogleHistoryId)
-            .order_by(GoogleHistoryId.created_at.desc())
+            # ids recorded in the same transaction share created_at
+            .order_by(GoogleHistoryId.created_at.desc(), GoogleHistoryId.id.desc())
             .filter_by(user_id=user.id)
             .first()
         )
-        if history_id_record:
-            return history_id_record.history_id
 
     def create_history_id(self, user: User, current_history_id: str) -> GoogleHistoryId:
+        """Records current_history_id as the user's latest, unless a newer one was
+        recorded already (by a sync that finished first), then that one is returned.
+        """
+        latest = self._get_latest_history_id_record(user)
+        if latest and self._is_older_history_id(current_history_id, latest.history_id):
+            logger.info(
+                f"{user} not recording history_id={current_history_id}, it's older than {latest.history_id}"
+            )
+            return latest
         new_history_id = GoogleHistoryId()
         new_history_id.history_id = current_history_id
         new_history_id.user_id = user.id
@@ -83,11 +105,24 @@ class UserManager(ManagerFactory):
         self.session.flush()
         return new_history_id
 
+    @staticmethod
+    def _is_older_history_id(history_id: Optional[str], other: Optional[str]) -> bool:
+        if other is None:
+            return False
+        if history_id is None:
+            return True
+        try:
+            return int(history_id) < int(other)
+        except ValueError:
+            return False
+
     def get_google_account_email(self, user: User) -> Optional[str]:
         """Return email associated with the google account connected to the given user"""
         gmail_api_client = self.get_gmail_api_client(user)
         if gmail_api_client:
-            return gmail_api_client.get_user_profile().get("emailAddress")
+            return gmail_api_client.get_user_profile(fields="emailAddress").get(
+                "emailAddress"
+            )
 
     def google_login_step1(self) -> str:
         google_auth_client: GoogleAuthClient = GoogleAuthClient(self.config)
@@ -186,6 +221,7 @@ class UserManager(ManagerFactory):
         google_credential.user_id = user.id
         self.session.add(google_credential)
         self.session.flush()
+        gmail_api_client_cache.invalidate(user.id)
 
     def authenicate_user(self, email: str, password: str) -> Optional[User]:
         """Authenticate user with email and password.
@@ -202,23 +238,84 @@ class UserManager(ManagerFactory):
             return user
 
     def get_gmail_api_client(self, user: User) -> Optional[GoogleApiClient]:
-        """Create GoogleApiClient object for given user if they have connected their google account"""
-        credentials_record: GoogleAuthCredential = (
-            self.session.query(GoogleAuthCredential)
-            .filter_by(user_id=user.id)
-            .order_by(GoogleAuthCredential.created_at.desc())
-            .filter(GoogleAuthCredential.created_at != None)
-            .first()
+        """Get GoogleApiClient object for given user if they have connected their google account.
+
+        Clients are cached in the process for GMAIL_CLIENT_CACHE_TTL seconds (and
+        dropped when the user connects their account again), so the credentials
+        aren't loaded and the gmail service isn't built for every call.
+        """
+        cached = self._get_cached_gmail_api_client(user)
+        if cached is not None:
+            _, gmail_api_client = cached
+            return gmail_api_client
+
+    def _get_cached_gmail_api_client(
+        self, user: User
+    ) -> Optional[Tuple[int, GoogleApiClient]]:
+        cached = gmail_api_client_cache.get(
+            user.id,
+            lambda: self._create_gmail_api_client(user),
+            ttl=self.config.get("GMAIL_CLIENT_CACHE_TTL"),
         )
+        if cached is None:
+            # users that haven't connected their account yet aren't cached
+            gmail_api_client_cache.invalidate(user.id)
+        return cached
+
+    def _create_gmail_api_client(
+        self, user: User
+    ) -> Optional[Tuple[int, GoogleApiClient]]:
+        """Create GoogleApiClient object for given user, along with the id of the credentials it uses"""
+        credentials_record = self._get_latest_credentials_record(user)
         if credentials_record:
             credentials_json_str = credentials_record.credentials
-            return GoogleApiClient.init_api_client(credentials_json_str)
+            return (
+                credentials_record.id,
+                GoogleApiClient.init_api_client(credentials_json_str, user.id),
+            )
         else:
             logger.info(
                 f"{user} has not connected Google account so cannot initialize a GoogleApiClient instance."
             )
             return
 
+    def _get_latest_credentials_record(
+        self, user: User
+    ) -> Optional[GoogleAuthCredential]:
+        return (
+            self.session.query(GoogleAuthCredential)
+            .filter_by(user_id=user.id)
+            .order_by(GoogleAuthCredential.created_at.desc())
+            .filter(GoogleAuthCredential.created_at != None)
+            .first()
+        )
+
+    def save_refreshed_gmail_credentials(self, user: User) -> bool:
+        """Writes the user's gmail credentials back if the access token was refreshed,
+        so the next run (or another process) doesn't have to refresh it again.
+        Adds, and flushes, but does not commit the credentials.
+
+        Returns:
+            bool: whether credentials were saved
+        """
+        cached = self._get_cached_gmail_api_client(user)
+        if cached is None:
+            return False
+        credentials_id, gmail_api_client = cached
+        credentials_json_str = gmail_api_client.get_refreshed_credentials_json()
+        if credentials_json_str is None:
+            return False
+        credentials_record = self.session.query(GoogleAuthCredential).get(
+            credentials_id
+        )
+        if credentials_record is None:
+            return False
+        credentials_record.credentials = credentials_json_str
+        self.session.add(credentials_record)
+        self.session.flush()
+        logger.debug(f"Saved refreshed gmail credentials for {user}.")
+        return True
+
     def get_user_config(self, user: User) -> Tuple[UserConfig, bool]:
         """Get's user's config object (and creates one if it doesn't exist)
         Returns:
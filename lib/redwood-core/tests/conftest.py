@@ -0,0 +1,86 @@
+"""
+Fixtures for tests that need a database.
+
+They run against the postgres database in TEST_DATABASE_URI and are skipped
+when it isn't set. Every test runs in a transaction that is rolled back.
+"""
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from redwood_core import migrate
+from redwood_core.factory import ManagerFactory
+from redwood_db.content import Article
+
+
+@pytest.fixture(scope="session")
+def engine():
+    database_uri = os.environ.get("TEST_DATABASE_URI")
+    if not database_uri:
+        pytest.skip("TEST_DATABASE_URI isn't set")
+    engine = create_engine(database_uri)
+    Article.metadata.create_all(bind=engine, checkfirst=True)
+    migrate.migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = sessionmaker(bind=connection)()
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def config():
+    return {}
+
+
+@pytest.fixture
+def manager_factory(session, config):
+    return ManagerFactory(session, config)
+
+
+@pytest.fixture
+def user(manager_factory):
+    return manager_factory.get_manager("user").create_user(
+        "reader@example.com", "Avery", "Reader"
+    )
+
+
+@pytest.fixture
+def boxes(manager_factory, user):
+    """The user's boxes by name"""
+    triage_manager = manager_factory.get_manager("triage")
+    return {box.name: box for box in triage_manager.get_boxes_for_user(user)}
+
+
+@pytest.fixture
+def make_article(manager_factory, user):
+    """Creates an article of the user, triaged to box when one is given"""
+
+    def make_article(gmail_message_id, received_at=datetime(2021, 3, 1), box=None):
+        article = manager_factory.get_manager("content").create_new_article(
+            user,
+            "Weekly",
+            "writer@substack.com",
+            "Writer",
+            "",
+            "This week",
+            "<p>This week</p>",
+            gmail_message_id,
+            received_at,
+        )
+        if box is not None:
+            manager_factory.get_manager("triage").create_new_triage(article, box)
+        return article
+
+    return make_article
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import inspect
+
+
+@pytest.fixture
+def article(manager_factory, make_article):
+    article = make_article("first", datetime(2021, 3, 1, 9, 30))
+    manager_factory.session.expunge_all()
+    return article.id
+
+
+def test_only_requested_fields(manager_factory, user, article):
+    content_manager = manager_factory.get_manager("content")
+    fields = ["title", "message_received_at", "title"]
+
+    (loaded,) = content_manager.get_articles_by_id(user, None, [article], fields)
+
+    article_json = content_manager.article_to_json(loaded, fields)
+
+    assert list(article_json) == ["id", "title", "message_received_at"]
+    assert article_json["id"] == article
+    assert article_json["title"] == "Weekly"
+    received_at = datetime.fromisoformat(article_json["message_received_at"])
+    assert received_at.replace(tzinfo=None) == datetime(2021, 3, 1, 9, 30)
+    assert "html_content" in inspect(loaded).unloaded
+
+
+def test_unknown_field(manager_factory, user, article):
+    content_manager = manager_factory.get_manager("content")
+
+    with pytest.raises(ValueError):
+        content_manager.get_article_by_id(article, user, ["title", "password"])
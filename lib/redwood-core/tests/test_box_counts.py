@@ -0,0 +1,70 @@
+import pytest
+
+from redwood_core.models import BoxArticleCount
+
+
+@pytest.fixture
+def config():
+    return {"BOX_ARTICLE_COUNTERS": True}
+
+
+def counters(session, boxes):
+    return dict(
+        session.query(BoxArticleCount.box_id, BoxArticleCount.article_count)
+        .filter(BoxArticleCount.box_id.in_([box.id for box in boxes.values()]))
+        .all()
+    )
+
+
+def test_counters_follow_triages(manager_factory, user, boxes, make_article):
+    triage_manager = manager_factory.get_manager("triage")
+    first = make_article("first", box=boxes["Inbox"])
+    make_article("second", box=boxes["Inbox"])
+    triage_manager.create_new_triage(first, boxes["Library"])
+
+    counts = triage_manager.get_article_counts_by_box(user, boxes.values())
+
+    assert counts == {
+        boxes["Inbox"].id: 1,
+        boxes["Queue"].id: 0,
+        boxes["Library"].id: 1,
+    }
+    assert counters(manager_factory.session, boxes) == {
+        boxes["Inbox"].id: 1,
+        boxes["Library"].id: 1,
+    }
+
+
+@pytest.mark.parametrize("config", [{}])
+def test_counters_not_written_when_off(manager_factory, user, boxes, make_article):
+    make_article("first", box=boxes["Inbox"])
+
+    counts = manager_factory.get_manager("triage").get_article_counts_by_box(
+        user, boxes.values()
+    )
+
+    assert counts[boxes["Inbox"].id] == 1
+    assert counters(manager_factory.session, boxes) == {}
+
+
+def test_rebuild(manager_factory, user, boxes, make_article):
+    session = manager_factory.session
+    triage_manager = manager_factory.get_manager("triage")
+    make_article("first", box=boxes["Inbox"])
+    make_article("second", box=boxes["Library"])
+    session.query(BoxArticleCount).filter_by(box_id=boxes["Inbox"].id).update(
+        {BoxArticleCount.article_count: 7}
+    )
+    session.add(
+        BoxArticleCount(box_id=boxes["Queue"].id, user_id=user.id, article_count=3)
+    )
+    session.flush()
+
+    triage_manager.rebuild_box_article_counts()
+
+    session.expire_all()
+    assert counters(session, boxes) == {
+        boxes["Inbox"].id: 1,
+        boxes["Queue"].id: 0,
+        boxes["Library"].id: 1,
+    }
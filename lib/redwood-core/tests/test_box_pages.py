@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+START = datetime(2021, 3, 1, 9, 0)
+
+
+@pytest.fixture
+def config():
+    return {"BOX_PAGE_SIZE": 3}
+
+
+@pytest.fixture
+def add_articles(manager_factory, make_article):
+    """Adds an article per received at time, triaged to the box in the same order"""
+    triage_manager = manager_factory.get_manager("triage")
+
+    def add_articles(box, received_ats):
+        articles = []
+        for i, received_at in enumerate(received_ats):
+            article = make_article(f"message-{box.name}-{i}", received_at)
+            triage = triage_manager.create_new_triage(article, box)
+            # two triages for every time, pages have to break ties on the id
+            triage.created_at = START + timedelta(minutes=i // 2)
+            articles.append(article)
+        manager_factory.session.flush()
+        return articles
+
+    return add_articles
+
+
+def all_pages(content_manager, user, box):
+    article_ids, cursor = content_manager.get_article_page_by_box_id(user, box.id)
+    pages = [article_ids]
+    while cursor is not None:
+        article_ids, cursor = content_manager.get_article_page_by_box_id(
+            user, box.id, cursor
+        )
+        pages.append(article_ids)
+    return pages
+
+
+def test_inbox_pages_newest_received_first(manager_factory, user, boxes, add_articles):
+    received_ats = [START + timedelta(hours=i // 2) for i in range(8)]
+    articles = add_articles(boxes["Inbox"], received_ats)
+    content_manager = manager_factory.get_manager("content")
+
+    pages = all_pages(content_manager, user, boxes["Inbox"])
+
+    expected = sorted(
+        articles, key=lambda a: (a.message_received_at, a.id), reverse=True
+    )
+    assert [len(page) for page in pages] == [3, 3, 2]
+    assert sum(pages, []) == [article.id for article in expected]
+
+
+@pytest.mark.parametrize("box_name,newest_first", [("Queue", False), ("Library", True)])
+def test_triaged_boxes_pages_by_triage_time(
+    manager_factory, user, boxes, add_articles, box_name, newest_first
+):
+    box = boxes[box_name]
+    articles = add_articles(box, [START] * 6)
+    content_manager = manager_factory.get_manager("content")
+
+    pages = all_pages(content_manager, user, box)
+
+    expected = [article.id for article in articles]
+    if newest_first:
+        expected.reverse()
+    assert [len(page) for page in pages] == [3, 3]
+    assert sum(pages, []) == expected
+
+
+def test_exact_page_has_no_next_cursor(manager_factory, user, boxes, add_articles):
+    add_articles(boxes["Queue"], [START] * 3)
+    content_manager = manager_factory.get_manager("content")
+
+    article_ids, cursor = content_manager.get_article_page_by_box_id(
+        user, boxes["Queue"].id
+    )
+
+    assert len(article_ids) == 3
+    assert cursor is None
+
+
+def test_invalid_cursor(manager_factory, user, boxes, add_articles):
+    add_articles(boxes["Queue"], [START] * 4)
+    content_manager = manager_factory.get_manager("content")
+    _, cursor = content_manager.get_article_page_by_box_id(user, boxes["Queue"].id)
+
+    with pytest.raises(ValueError):
+        content_manager.get_article_page_by_box_id(user, boxes["Queue"].id, "nope")
+    # cursors are only valid for the box they came from
+    with pytest.raises(ValueError):
+        content_manager.get_article_page_by_box_id(user, boxes["Library"].id, cursor)
+
+
+def test_other_users_box(manager_factory, user, boxes, add_articles):
+    add_articles(boxes["Inbox"], [START] * 2)
+    other_user = manager_factory.get_manager("user").create_user(
+        "other@example.com", "Sam", "Other"
+    )
+
+    assert manager_factory.get_manager("content").get_article_page_by_box_id(
+        other_user, boxes["Inbox"].id
+    ) == ([], None)
@@ -0,0 +1,107 @@
+import base64
+
+import pytest
+
+from redwood_core.article import pool
+from redwood_db.content import Article
+
+
+def gmail_message(
+    gmail_message_id, unread=True, content_type="text/html", subject=True
+):
+    body = base64.urlsafe_b64encode(b"<h1>Weekly</h1><p>This week</p>").decode()
+    headers = [
+        {"name": "From", "value": "Writer <writer@substack.com>"},
+        {"name": "Content-Type", "value": content_type},
+    ]
+    if subject:
+        headers.append({"name": "Subject", "value": f"Weekly {gmail_message_id}"})
+    return {
+        "id": gmail_message_id,
+        "labelIds": ["UNREAD"] if unread else ["INBOX"],
+        "payload": {"headers": headers, "body": {"data": body}},
+    }
+
+
+def test_creates_articles_and_triages(manager_factory, user):
+    content_manager = manager_factory.get_manager("content")
+
+    created = content_manager.bulk_create_articles_from_gmail(
+        user, [gmail_message("first"), gmail_message("second", unread=False)], True
+    )
+
+    assert [message["id"] for message, _ in created] == ["first", "second"]
+    triage_manager = manager_factory.get_manager("triage")
+    boxes = [
+        triage_manager.get_box_for_article_id(user, article_id).name
+        for _, article_id in created
+    ]
+    assert boxes == ["Inbox", "Library"]
+
+
+def test_skips_articles_inserted_concurrently(
+    manager_factory, user, make_article, monkeypatch
+):
+    content_manager = manager_factory.get_manager("content")
+    existing = make_article("first")
+    # as if another worker inserted it after the existing articles were checked
+    monkeypatch.setattr(
+        content_manager, "get_existing_gmail_message_ids", lambda *args: set()
+    )
+
+    created = content_manager.bulk_create_articles_from_gmail(
+        user, [gmail_message("first"), gmail_message("second")]
+    )
+
+    assert [message["id"] for message, _ in created] == ["second"]
+    articles = (
+        content_manager.session.query(Article.id, Article.gmail_message_id)
+        .filter(Article.user_id == user.id)
+        .order_by(Article.id)
+        .all()
+    )
+    assert articles == [(existing.id, "first"), (created[0][1], "second")]
+
+
+def test_skips_messages_that_cant_become_articles(manager_factory, user):
+    content_manager = manager_factory.get_manager("content")
+
+    created = content_manager.bulk_create_articles_from_gmail(
+        user,
+        [
+            gmail_message("plain", content_type="text/plain"),
+            gmail_message("untitled", subject=False),
+            gmail_message("html"),
+        ],
+    )
+
+    assert [message["id"] for message, _ in created] == ["html"]
+
+
+def test_skips_html_that_cant_be_transformed(manager_factory, user, monkeypatch):
+    def transform_article_html(config, source_type, html_content):
+        if "broken" in html_content:
+            raise ValueError("can't parse")
+        return html_content, "", "text"
+
+    monkeypatch.setattr(pool, "transform_article_html", transform_article_html)
+    message = gmail_message("broken")
+    message["payload"]["body"]["data"] = base64.urlsafe_b64encode(b"broken").decode()
+
+    created = manager_factory.get_manager("content").bulk_create_articles_from_gmail(
+        user, [message, gmail_message("html")]
+    )
+
+    assert [message["id"] for message, _ in created] == ["html"]
+
+
+def test_other_transform_failures_fail_the_batch(manager_factory, user, monkeypatch):
+    def result(task):
+        raise RuntimeError("transformer pool unavailable")
+
+    monkeypatch.setattr(pool.get_transformer_pool({}), "result", result)
+
+    with pytest.raises(RuntimeError):
+        manager_factory.get_manager("content").bulk_create_articles_from_gmail(
+            user, [gmail_message("html")]
+        )
@@ -0,0 +1,61 @@
+import time
+
+from redwood_core.cache import TTLCache
+
+
+def test_hit_and_miss():
+    cache = TTLCache(ttl=60)
+
+    assert cache.get("a", lambda: 1) == 1
+    assert cache.get("a", lambda: 2) == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_expired_entries_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(ttl=60)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+
+    now[0] += 61
+    assert cache.get("a", lambda: 3) == 3
+    # b wasn't looked up again but is gone all the same
+    assert cache.stats()["size"] == 1
+
+    now[0] += 61
+    cache.get("c", lambda: 4)
+    assert cache.stats()["size"] == 1
+
+
+def test_invalidate_during_load():
+    cache = TTLCache(ttl=60)
+
+    def load():
+        cache.invalidate("a")
+        return "stale"
+
+    assert cache.get("a", load) == "stale"
+    assert cache.get("a", lambda: "fresh") == "fresh"
+
+
+def test_invalidate_all_during_load():
+    cache = TTLCache(ttl=60)
+
+    def load():
+        cache.invalidate()
+        return "stale"
+
+    assert cache.get("a", load) == "stale"
+    assert cache.get("a", lambda: "fresh") == "fresh"
+
+
+def test_invalidate_other_key_during_load():
+    cache = TTLCache(ttl=60)
+
+    def load():
+        cache.invalidate("b")
+        return 1
+
+    cache.get("a", load)
+    assert cache.get("a", lambda: 2) == 1
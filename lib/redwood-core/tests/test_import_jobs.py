@@ -0,0 +1,43 @@
+from sqlalchemy import func
+
+from redwood_core.models import GmailImportJob
+
+
+def test_open_import_job(manager_factory, user):
+    content_manager = manager_factory.get_manager("content")
+    assert not content_manager.has_open_import_job(user)
+
+    import_job = content_manager.create_import_job(user)
+    assert content_manager.has_open_import_job(user)
+
+    content_manager.finish_import_job(import_job.id, 1, "500")
+    content_manager.complete_import_batch(import_job.id, 0)
+    assert not content_manager.has_open_import_job(user)
+
+
+def test_import_jobs_time_out(manager_factory, user):
+    content_manager = manager_factory.get_manager("content")
+    import_job = content_manager.create_import_job(user)
+    manager_factory.session.query(GmailImportJob).filter_by(id=import_job.id).update(
+        {GmailImportJob.created_at: func.now() - func.make_interval(0, 0, 0, 2)},
+        synchronize_session=False,
+    )
+
+    assert not content_manager.has_open_import_job(user)
+
+
+def test_older_history_id_not_recorded(manager_factory, user):
+    user_manager = manager_factory.get_manager("user")
+    content_manager = manager_factory.get_manager("content")
+    import_job = content_manager.create_import_job(user)
+    # the cron synced the user while the import was running
+    user_manager.create_history_id(user, "700")
+
+    content_manager.finish_import_job(import_job.id, 1, "500")
+    content_manager.complete_import_batch(import_job.id, 0)
+
+    assert user_manager.get_latest_history_id(user) == "700"
+    user_manager.create_history_id(user, None)
+    assert user_manager.get_latest_history_id(user) == "700"
+    user_manager.create_history_id(user, "800")
+    assert user_manager.get_latest_history_id(user) == "800"
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from redwood_core.models import GmailSyncSchedule
+
+
+def test_creates_schedule_due_now(manager_factory, user):
+    schedule_manager = manager_factory.get_manager("schedule")
+
+    schedule = schedule_manager.get_or_create_schedule(user)
+
+    assert schedule.user_id == user.id
+    assert schedule.next_sync_at <= datetime.utcnow()
+    assert schedule_manager.get_or_create_schedule(user) is schedule
+
+
+def test_returns_schedule_created_concurrently(manager_factory, user, monkeypatch):
+    session = manager_factory.session
+    schedule_manager = manager_factory.get_manager("schedule")
+    next_sync_at = datetime(2021, 3, 1)
+    session.add(GmailSyncSchedule(user_id=user.id, next_sync_at=next_sync_at))
+    session.flush()
+    session.expunge_all()
+    get_schedule = schedule_manager.get_schedule
+    checks = []
+
+    def created_after_first_check(user):
+        checks.append(user)
+        return get_schedule(user) if len(checks) > 1 else None
+
+    # as if the schedule was created by another job after checking for it
+    monkeypatch.setattr(schedule_manager, "get_schedule", created_after_first_check)
+
+    schedule = schedule_manager.get_or_create_schedule(user)
+
+    assert len(checks) == 2
+    assert schedule.next_sync_at == next_sync_at
+
+
+def test_sync_not_due_after_another_instance_synced(manager_factory, user):
+    session = manager_factory.session
+    schedule_manager = manager_factory.get_manager("schedule")
+    schedule = schedule_manager.get_or_create_schedule(user)
+    assert schedule_manager.is_sync_due(user)
+
+    # another instance syncs the user, the schedule loaded here is stale
+    session.execute(
+        GmailSyncSchedule.__table__.update()
+        .where(GmailSyncSchedule.user_id == user.id)
+        .values(next_sync_at=datetime.utcnow() + timedelta(hours=1))
+    )
+
+    assert not schedule_manager.is_sync_due(user)
+    assert schedule.next_sync_at > datetime.utcnow()
+
+
+def test_sync_due_without_schedule(manager_factory, user):
+    assert manager_factory.get_manager("schedule").is_sync_due(user)
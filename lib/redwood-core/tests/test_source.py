@@ -0,0 +1,102 @@
+import pytest
+
+from redwood_core.article.source import (
+    SubscriptionMatcher,
+    general_newsletter_subscriptions,
+    is_newsletter_subscription,
+    new_subscription,
+)
+
+
+def first_matching_subscription(subscriptions, from_address, from_name):
+    """What SubscriptionMatcher replaces, checking every subscription in order"""
+    for subscription in subscriptions:
+        if is_newsletter_subscription(from_address, from_name, subscription):
+            return subscription
+    return None
+
+
+def test_exact_address():
+    subscription = new_subscription("^hello@6pages.com$")
+    matcher = SubscriptionMatcher([subscription])
+
+    assert matcher.match("hello@6pages.com", "6 Pages") is subscription
+    assert matcher.match("Hello@6Pages.com", "6 Pages") is subscription
+    assert matcher.match("hello@6pagesxcom", "6 Pages") is None
+    assert matcher.match("other@6pages.com", "6 Pages") is None
+    assert "hello@6pages.com" in matcher.exact_addresses
+    assert matcher.regex_subscriptions == []
+
+
+def test_domain():
+    subscription = new_subscription("@substack.com")
+    matcher = SubscriptionMatcher([subscription])
+
+    assert matcher.match("writer@substack.com", "Writer") is subscription
+    assert matcher.match("writer@SUBSTACK.com", "Writer") is subscription
+    assert matcher.match("writer@gmail.com", "Writer") is None
+    assert "substack.com" in matcher.domains
+    assert matcher.regex_subscriptions == []
+
+
+def test_name_pattern():
+    subscription = new_subscription("^news@example.com$", "^Weekly")
+    matcher = SubscriptionMatcher([subscription])
+
+    assert matcher.match("news@example.com", "weekly digest") is subscription
+    assert matcher.match("news@example.com", "Daily digest") is None
+    assert matcher.match("news@example.com", None) is None
+
+
+def test_regexes():
+    first = new_subscription("^news(letter)?@example\\.(com|org)$")
+    second = new_subscription("digest@.*\\.example\\.net", "Digest")
+    matcher = SubscriptionMatcher([first, second])
+
+    assert matcher.combined_regex is not None
+    assert matcher.match("newsletter@example.org", "Example") is first
+    assert matcher.match("digest@mail.example.net", "The Digest") is second
+    assert matcher.match("digest@mail.example.net", "Someone") is None
+    assert matcher.match("news@example.io", "Example") is None
+
+
+def test_regex_name_mismatch_falls_back_to_other_regexes():
+    first = new_subscription("@.*example", "^Alice$")
+    second = new_subscription("example\\.com", "^Bob$")
+    matcher = SubscriptionMatcher([first, second])
+
+    assert matcher.match("news@example.com", "Bob") is second
+
+
+def test_uncombinable_regexes():
+    subscription = new_subscription("^(\\w+)@\\1\\.com$")
+    matcher = SubscriptionMatcher([subscription, new_subscription("^a@b\\.c$")])
+
+    assert matcher.combined_regex is None
+    assert matcher.match("acme@acme.com", "Acme") is subscription
+    assert matcher.match("acme@other.com", "Acme") is None
+
+
+def test_no_subscriptions():
+    assert SubscriptionMatcher([]).match("news@example.com", "Example") is None
+
+
+@pytest.mark.parametrize(
+    "from_address,from_name",
+    [
+        ("crew@morningbrew.com", "Morning Brew"),
+        ("someone@substack.com", "Someone"),
+        ("news@axios.com", "Axios"),
+        ("hi@qz.com", "Quartz"),
+        ("friend@gmail.com", "A Friend"),
+        ("crew@morningbrew.co", "Morning Brew"),
+        ("", ""),
+        (None, None),
+    ],
+)
+def test_general_subscriptions_match_like_before(from_address, from_name):
+    matcher = SubscriptionMatcher(general_newsletter_subscriptions)
+
+    assert matcher.match(from_address, from_name) is first_matching_subscription(
+        general_newsletter_subscriptions, from_address or "", from_name or ""
+    )
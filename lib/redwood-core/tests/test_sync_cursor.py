@@ -0,0 +1,61 @@
+import pytest
+
+from redwood_core.user_manager import UserManager
+
+
+class FakeGmailClient(object):
+    """Lists pages of message ids, the history id comes with the first page"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.listed = []
+
+    def list_new_emails_page(self, history_id, page_token=None, query=None):
+        index = int(page_token) if page_token else 0
+        self.listed.append(index)
+        next_page_token = str(index + 1) if index + 1 < len(self.pages) else None
+        return self.pages[index], next_page_token, "900" if index == 0 else None
+
+
+@pytest.fixture
+def gmail_client(monkeypatch):
+    gmail_client = FakeGmailClient([["a", "b"], ["c"], ["d"]])
+    monkeypatch.setattr(
+        UserManager, "get_gmail_api_client", lambda self, user: gmail_client
+    )
+    return gmail_client
+
+
+def test_lists_every_page(manager_factory, user, gmail_client):
+    content_manager = manager_factory.get_manager("content")
+
+    pages = list(content_manager.get_new_email_pages(user))
+
+    assert pages == [["a", "b"], ["c"], ["d"]]
+    assert content_manager.get_sync_cursor(user) is None
+    assert manager_factory.get_manager("user").get_latest_history_id(user) == "900"
+
+
+def test_resumes_when_first_page_failed(manager_factory, user, gmail_client):
+    content_manager = manager_factory.get_manager("content")
+    # the first page fails after the new cursor was committed
+    next(content_manager.get_new_email_pages(user))
+
+    pages = list(content_manager.get_new_email_pages(user))
+
+    assert pages == [["a", "b"], ["c"], ["d"]]
+    assert manager_factory.get_manager("user").get_latest_history_id(user) == "900"
+
+
+def test_resumes_after_last_processed_page(manager_factory, user, gmail_client):
+    content_manager = manager_factory.get_manager("content")
+    first_pages = content_manager.get_new_email_pages(user)
+    next(first_pages)
+    # the second page fails after the first one was checkpointed
+    next(first_pages)
+
+    pages = list(content_manager.get_new_email_pages(user))
+
+    assert pages == [["c"], ["d"]]
+    assert gmail_client.listed == [0, 1, 1, 2]
+    assert manager_factory.get_manager("user").get_latest_history_id(user) == "900"
@@ -2,8 +2,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 
-def setup_db_session(db_uri: str):
-    db_engine = create_engine(db_uri)
-    Session = sessionmaker(bind=db_engine)
-    session = Session()
-    return session
+def setup_db_sessionmaker(db_uri: str, pool_size: int = 5) -> sessionmaker:
+    """Session factory sharing one engine, sized for pool_size concurrent sessions"""
+    db_engine = create_engine(db_uri, pool_size=pool_size)
+    return sessionmaker(bind=db_engine)
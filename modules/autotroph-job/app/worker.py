@@ -1,5 +1,16 @@
 import logging
+import os
+import socket
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
+from sqlalchemy.orm import sessionmaker
+
+from autotroph_core.google_api import GoogleApiClient
+from redwood_core.article.pool import get_transformer_pool
+from redwood_core.cache import subscription_matcher_cache
 from redwood_core.factory import ManagerFactory
 from redwood_db.user import User
 
@@ -8,43 +19,163 @@ from ._config import config
 
 logger = logging.getLogger(__name__)
 
+# sync_user_gmail outcomes
+SYNC_SYNCED = "synced"
+SYNC_SKIPPED = "skipped"
+SYNC_FAILED = "failed"
+SYNC_CLAIMED = "claimed"
+
+
+def sync_gmail(shard_index: Optional[int] = None, shard_count: Optional[int] = None):
+    """Sync gmail for all users that are due.
 
-def sync_gmail():
-    logger.info("Starting gmail sync for all users.")
+    Args:
+        shard_index (Optional[int]): shard of the users this instance syncs,
+            defaults to the SYNC_SHARD_INDEX config
+        shard_count (Optional[int]): number of instances running side by side,
+            defaults to the SYNC_SHARD_COUNT config
+    """
+    if shard_index is None:
+        shard_index = int(config.get("SYNC_SHARD_INDEX", 0))
+    if shard_count is None:
+        shard_count = int(config.get("SYNC_SHARD_COUNT", 1))
+    # identifies this instance's leases
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    logger.info(
+        f"Starting gmail sync for shard {shard_index} of {shard_count} as {owner}."
+    )
 
     # Object setup
-    session = db.setup_db_session(config["SQLALCHEMY_DATABASE_URI"])
+    concurrency = max(int(config.get("SYNC_GMAIL_CONCURRENCY", 1)), 1)
+    GoogleApiClient.set_max_concurrent_requests(
+        config.get("GMAIL_MAX_CONCURRENT_REQUESTS")
+    )
+    GoogleApiClient.set_rate_limit(config.get("GMAIL_QUOTA_UNITS_PER_SECOND"))
+    GoogleApiClient.set_user_rate_limit(config.get("GMAIL_USER_QUOTA_UNITS_PER_SECOND"))
+    GoogleApiClient.set_http_pool_size(config.get("GMAIL_HTTP_POOL_SIZE"))
+    # started before any threads, transformer processes are forked
+    get_transformer_pool(config)
+    Session = db.setup_db_sessionmaker(
+        config["SQLALCHEMY_DATABASE_URI"], pool_size=concurrency
+    )
+
+    session = Session()
+    factory = ManagerFactory(session, config)
+    user_manager = factory.get_manager("user")
+    schedule_manager = factory.get_manager("schedule")
+    users = user_manager.get_users_with_gmail_permissions()
+    # users are synced more or less often depending on their schedule
+    user_ids = [
+        user.id
+        for user in schedule_manager.get_users_due_for_sync(
+            users, shard_index=shard_index, shard_count=shard_count
+        )
+    ]
+    logger.info(f"{len(user_ids)} of {len(users)} users are due for a sync.")
+    session.close()
+
+    if concurrency > 1:
+        logger.info(f"Syncing {len(user_ids)} users, {concurrency} at a time.")
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(
+                executor.map(
+                    lambda user_id: sync_user_gmail(Session, user_id, owner), user_ids
+                )
+            )
+    else:
+        results = [sync_user_gmail(Session, user_id, owner) for user_id in user_ids]
+
+    counts = Counter(results)
+    skip_rate = counts[SYNC_SKIPPED] / len(results) if len(results) else 0
+    logger.info(
+        f"Completed gmail sync. users={len(results)} synced={counts[SYNC_SYNCED]} "
+        f"skipped={counts[SYNC_SKIPPED]} failed={counts[SYNC_FAILED]} "
+        f"claimed_elsewhere={counts[SYNC_CLAIMED]} skip_rate={skip_rate:.2f}"
+    )
+    logger.info(f"Subscription cache: {subscription_matcher_cache.stats()}")
+    logger.info(f"Gmail requests: {GoogleApiClient.get_request_stats()}")
+    logger.info(f"Gmail connections: {GoogleApiClient.get_http_pool_stats()}")
+    get_transformer_pool(config).shutdown()
+
+
+def sync_user_gmail(Session: sessionmaker, user_id: int, owner: str) -> str:
+    """Sync gmail for a single user.
+
+    The user is claimed for owner first (and the claim renewed after every page),
+    users claimed by another instance, or synced by one since they were found due,
+    are left alone.
+    Uses its own session (and managers), so a failure only rolls back this user's work.
+    Users whose mailbox hasn't changed since the last sync, or whose initial import is
+    still running in the worker, are skipped. The user's next sync is scheduled
+    unless the sync failed or the import is running, those are retried next run.
+
+    Returns:
+        str: SYNC_SYNCED, SYNC_SKIPPED, SYNC_FAILED or SYNC_CLAIMED
+    """
+    session = Session()
     factory = ManagerFactory(session, config)
 
     user_manager = factory.get_manager("user")
     content_manager = factory.get_manager("content")
+    schedule_manager = factory.get_manager("schedule")
 
-    authenticated_users = user_manager.get_users_with_gmail_permissions()
-
-    for user in authenticated_users:
+    claimed = False
+    try:
         # Setup Logic
-        user: User
-        try:
-            logger.info(f"Attempting to update inbox for {user}")
-            gmail_api_client = user_manager.get_gmail_api_client(user)
-            gmail_service = gmail_api_client.get_gmail_service()
-
-            messages = content_manager.get_new_emails(user)
-            # check if should add messages
-            for gmail_message_id in messages:
-                if content_manager.is_email_newsletter(user, gmail_message_id):
-                    gmail_message = gmail_api_client.get_email(gmail_message_id)
-                    if gmail_message:
-                        logger.info(
-                            f"{user} gmail message id: {gmail_message_id} will be imported as whittle email."
-                        )
-                        new_article = content_manager.create_new_article_from_gmail(
-                            user, gmail_message
-                        )
-                        content_manager.commit_changes()
-        except Exception as e:
-            logger.warning(
-                f"Exception encountered trying to sync gmail for {user}.", exc_info=e
-            )
-    logger.info(f"Completed gmail sync")
-    session.close()
+        user: User = session.query(User).get(user_id)
+        claimed = schedule_manager.claim_user(user, owner)
+        schedule_manager.commit_changes()
+        if not claimed:
+            logger.info(f"{user} is being synced by another instance, skipping.")
+            return SYNC_CLAIMED
+        if not schedule_manager.is_sync_due(user):
+            logger.info(f"{user} was synced by another instance, skipping.")
+            return SYNC_CLAIMED
+        if content_manager.has_open_import_job(user):
+            # synced once the import records the history id, not scheduled until then
+            logger.info(f"{user} is still being imported by the worker, skipping.")
+            return SYNC_SKIPPED
+        if not content_manager.has_new_emails(user):
+            logger.info(f"No mailbox changes for {user}, skipping.")
+            schedule_manager.record_sync(user, 0)
+            user_manager.save_refreshed_gmail_credentials(user)
+            schedule_manager.commit_changes()
+            return SYNC_SKIPPED
+        logger.info(f"Attempting to update inbox for {user}")
+        batch_size = content_manager.get_article_insert_batch_size()
+        num_created = 0
+        # commits also save the checkpoint of the previous page, see get_new_email_pages
+        for messages in content_manager.get_new_email_pages(user):
+            # only newsletters that haven't been imported yet are downloaded
+            newsletters = content_manager.get_newsletter_emails(user, messages)
+            for i in range(0, len(newsletters), batch_size):
+                created = content_manager.bulk_create_articles_from_gmail(
+                    user, newsletters[i : i + batch_size]
+                )
+                content_manager.commit_changes()
+                num_created += len(created)
+                logger.info(f"{user} imported {len(created)} whittle emails.")
+            if not schedule_manager.claim_user(user, owner):
+                raise RuntimeError(f"Lost the claim on {user} to another instance.")
+            content_manager.commit_changes()
+        # commits the new history id once every page is synced
+        schedule_manager.record_sync(user, num_created)
+        user_manager.save_refreshed_gmail_credentials(user)
+        content_manager.commit_changes()
+        return SYNC_SYNCED
+    except Exception as e:
+        session.rollback()
+        logger.warning(
+            f"Exception encountered trying to sync gmail for user_id={user_id}.",
+            exc_info=e,
+        )
+        return SYNC_FAILED
+    finally:
+        if claimed:
+            try:
+                schedule_manager.release_user(user, owner)
+                schedule_manager.commit_changes()
+            except Exception as e:
+                session.rollback()
+                logger.warning(f"Couldn't release user_id={user_id}.", exc_info=e)
+        session.close()
@@ -3,6 +3,15 @@ import os
 # SQLALCHEMY
 SQLALCHEMY_DATABASE_URI = os.environ.get("SQLALCHEMY_DATABASE_URI")
 
+# Article html transformation
+# worker processes for transforming html (0 transforms in process)
+ARTICLE_TRANSFORM_PROCESSES = int(os.environ.get("ARTICLE_TRANSFORM_PROCESSES", 0))
+ARTICLE_TRANSFORM_TIMEOUT = int(os.environ.get("ARTICLE_TRANSFORM_TIMEOUT", 60))
+# BeautifulSoup parser, "html.parser" or "lxml" (faster, output differs slightly)
+ARTICLE_HTML_PARSER = os.environ.get("ARTICLE_HTML_PARSER", "html.parser")
+# gmail messages saved (and committed) per batch
+ARTICLE_INSERT_BATCH_SIZE = int(os.environ.get("ARTICLE_INSERT_BATCH_SIZE", 50))
+
 # Logging
 tmp = os.environ.get("SUMM_LOG_FILE")
 if tmp:
@@ -11,3 +20,46 @@ if tmp:
 tmp = os.environ.get("SUMM_LOG_FILE_SIZE")
 if tmp:
     SUMM_LOG_FILE_SIZE = tmp
+
+# Gmail sync
+# number of users synced concurrently
+SYNC_GMAIL_CONCURRENCY = int(os.environ.get("SYNC_GMAIL_CONCURRENCY", 1))
+# max gmail requests in flight across all users (0 for no limit)
+GMAIL_MAX_CONCURRENT_REQUESTS = int(os.environ.get("GMAIL_MAX_CONCURRENT_REQUESTS", 0))
+# gmail quota units per second across all users (0 for no limit), the project's quota
+# is 20,000, split it between the processes using gmail
+GMAIL_QUOTA_UNITS_PER_SECOND = float(
+    os.environ.get("GMAIL_QUOTA_UNITS_PER_SECOND", 5000)
+)
+# gmail quota units per second of each user (0 for no limit), a user's quota is 250
+GMAIL_USER_QUOTA_UNITS_PER_SECOND = float(
+    os.environ.get("GMAIL_USER_QUOTA_UNITS_PER_SECOND", 250)
+)
+# gmail requests at once over connections shared by all users (0 for a transport per user)
+GMAIL_HTTP_POOL_SIZE = int(os.environ.get("GMAIL_HTTP_POOL_SIZE", 10))
+
+# Gmail sync scheduling, in seconds
+# users are synced about as often as they get newsletters, within these bounds
+SYNC_MIN_INTERVAL = int(os.environ.get("SYNC_MIN_INTERVAL", 10 * 60))
+SYNC_MAX_INTERVAL = int(os.environ.get("SYNC_MAX_INTERVAL", 6 * 60 * 60))
+# users that used the app within SYNC_ACTIVE_WINDOW are synced at least every SYNC_ACTIVE_MAX_INTERVAL
+SYNC_ACTIVE_WINDOW = int(os.environ.get("SYNC_ACTIVE_WINDOW", 24 * 60 * 60))
+SYNC_ACTIVE_MAX_INTERVAL = int(os.environ.get("SYNC_ACTIVE_MAX_INTERVAL", 30 * 60))
+
+# Sharding, instances running side by side each sync their own shard of the users
+SYNC_SHARD_INDEX = int(os.environ.get("SYNC_SHARD_INDEX", 0))
+SYNC_SHARD_COUNT = int(os.environ.get("SYNC_SHARD_COUNT", 1))
+# seconds overdue before a user of another shard is synced, in case that shard isn't running
+SYNC_SHARD_TAKEOVER_DELAY = int(os.environ.get("SYNC_SHARD_TAKEOVER_DELAY", 30 * 60))
+# seconds a claim on syncing a user lasts, renewed after every page
+SYNC_LEASE_SECONDS = int(os.environ.get("SYNC_LEASE_SECONDS", 15 * 60))
+
+# seconds before an initial import the worker didn't complete is given up on, users
+# aren't synced while their import is running
+GMAIL_IMPORT_JOB_TIMEOUT = int(os.environ.get("GMAIL_IMPORT_JOB_TIMEOUT", 24 * 60 * 60))
+
+# seconds a user's gmail client is cached for
+GMAIL_CLIENT_CACHE_TTL = int(os.environ.get("GMAIL_CLIENT_CACHE_TTL", 15 * 60))
+
+# keep box article counts up to date in the counter table, see the redwood config
+BOX_ARTICLE_COUNTERS = os.environ.get("BOX_ARTICLE_COUNTERS", "false").lower() == "true"
@@ -1,14 +1,22 @@
 import logging
-from typing import List, Tuple
+import signal
+import threading
+from typing import List, Optional, Tuple
 
 import pika
 
+from autotroph_core.google_api import GoogleApiClient
+from redwood_core.article.pool import get_transformer_pool
 from redwood_rabbitmq.connection import RMQConnection
 from redwood_rabbitmq.consume import RMQConsumer
 from redwood_rabbitmq.queue import NEW_GOOGLE_ACCOUNT_CONNECTED, BaseQueue
 
-from . import _config
-from .worker import import_gmail_newsletters
+from . import _config, db
+from .worker import (
+    GMAIL_IMPORT_BATCH_QUEUE,
+    import_gmail_newsletter_batch,
+    import_gmail_newsletters,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -17,16 +25,91 @@ queues: List[Tuple[BaseQueue, callable]] = [
 ]
 
 
+class ConsumerThread(threading.Thread):
+    """Consumes all queues on its own connection and channel.
+
+    pika connections aren't thread safe, so every consumer thread has its own.
+    """
+
+    def __init__(self, index: int, prefetch_count: int):
+        super().__init__(name=f"consumer-{index}")
+        self.prefetch_count = prefetch_count
+        self.channel: Optional[pika.adapters.blocking_connection.BlockingChannel] = None
+        self.stopping = threading.Event()
+
+    def run(self):
+        rmq_connection = RMQConnection(config=_config.config)
+        self.channel = rmq_connection.get_channel()
+        self.channel.basic_qos(prefetch_count=self.prefetch_count)
+        for queue_callback in queues:
+            logger.info(
+                "Adding queue %s on %s.", queue_callback[0].queue_name, self.name
+            )
+            consumer = RMQConsumer(queue=queue_callback[0], connection=rmq_connection)
+            consumer.setup_consumer(queue_callback[1])
+        logger.info("Adding queue %s on %s.", GMAIL_IMPORT_BATCH_QUEUE, self.name)
+        self.channel.queue_declare(queue=GMAIL_IMPORT_BATCH_QUEUE, durable=True)
+        self.channel.basic_consume(
+            queue=GMAIL_IMPORT_BATCH_QUEUE,
+            on_message_callback=import_gmail_newsletter_batch,
+        )
+        if not self.stopping.is_set():
+            self.channel.start_consuming()
+        logger.info("Stopped consuming on %s.", self.name)
+        rmq_connection.teardown()
+
+    def stop(self):
+        """Stop consuming once the message currently being handled (if any) is acked.
+
+        Prefetched messages that weren't handled are requeued when the connection closes.
+        """
+        self.stopping.set()
+        channel = self.channel
+        if channel is not None and channel.is_open:
+            channel.connection.add_callback_threadsafe(channel.stop_consuming)
+
+
 def run(config: dict):
     logger.info("Starting consumer...")
     logger.debug(f"Setting config object with values: {config}")
     _config.config.update(config)
-    rmq_connection = RMQConnection(config=_config.config)
-    for queue_callback in queues:
-        logger.info("Adding queue %s.", queue_callback[0].queue_name)
-        consumer = RMQConsumer(queue=queue_callback[0], connection=rmq_connection)
-        consumer.setup_consumer(queue_callback[1])
-    rmq_connection.get_channel().start_consuming()
-    logger.info("Stopped consuming.")
-    rmq_connection.teardown()
-    logger.info("Connection torn down. Consumer closing...")
+    # started before consuming, transformer processes are forked
+    get_transformer_pool(_config.config)
+    db.setup_db(_config.config)
+    GoogleApiClient.set_max_concurrent_requests(
+        _config.config.get("GMAIL_MAX_CONCURRENT_REQUESTS")
+    )
+    GoogleApiClient.set_rate_limit(_config.config.get("GMAIL_QUOTA_UNITS_PER_SECOND"))
+    GoogleApiClient.set_user_rate_limit(
+        _config.config.get("GMAIL_USER_QUOTA_UNITS_PER_SECOND")
+    )
+    GoogleApiClient.set_http_pool_size(_config.config.get("GMAIL_HTTP_POOL_SIZE"))
+
+    consumer_count = max(int(_config.config.get("RMQ_CONSUMER_COUNT", 1)), 1)
+    prefetch_count = int(_config.config.get("RMQ_PREFETCH_COUNT", 1))
+    consumers = [ConsumerThread(i, prefetch_count) for i in range(consumer_count)]
+
+    def stop_consumers(signum=None, frame=None):
+        logger.info("Stopping consumers, waiting for in flight messages...")
+        for consumer in consumers:
+            consumer.stop()
+
+    signal.signal(signal.SIGTERM, stop_consumers)
+    signal.signal(signal.SIGINT, stop_consumers)
+
+    logger.info(
+        f"Starting {consumer_count} consumers with prefetch count {prefetch_count}."
+    )
+    for consumer in consumers:
+        consumer.start()
+    # joining with a timeout keeps the main thread responsive to signals
+    while any(consumer.is_alive() for consumer in consumers):
+        for consumer in consumers:
+            consumer.join(timeout=1)
+            if not consumer.is_alive() and not consumer.stopping.is_set():
+                logger.error(f"{consumer.name} exited unexpectedly.")
+                stop_consumers()
+    logger.info(f"Gmail requests: {GoogleApiClient.get_request_stats()}")
+    logger.info(f"Gmail connections: {GoogleApiClient.get_http_pool_stats()}")
+    get_transformer_pool(_config.config).shutdown()
+    logger.info("Connections torn down. Consumer closing...")
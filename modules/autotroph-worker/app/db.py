@@ -1,9 +1,83 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import logging
+import threading
 
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
-def setup_db_session(db_uri: str):
-    db_engine = create_engine(db_uri)
-    Session = sessionmaker(bind=db_engine)
-    session = Session()
-    return session
+logger = logging.getLogger(__name__)
+
+# One engine (and connection pool) per process, see setup_db
+db_engine: Engine = None
+ScopedSession: scoped_session = None
+
+_pool_stats = {"connects": 0, "checkouts": 0, "checkins": 0, "max_overflow": 0}
+_pool_stats_lock = threading.Lock()
+
+
+def setup_db(config: dict) -> scoped_session:
+    """Creates the process' engine and scoped session factory, if not created yet.
+
+    Config options available:
+        SQLALCHEMY_POOL_SIZE, connections kept open in the pool (default 5)
+        SQLALCHEMY_MAX_OVERFLOW, connections allowed on top of the pool size (default 10)
+        SQLALCHEMY_POOL_RECYCLE, seconds after which connections are replaced (default -1, never)
+        SQLALCHEMY_POOL_TIMEOUT, seconds to wait for a connection from the pool (default 30)
+    """
+    global db_engine, ScopedSession
+    if db_engine is None:
+        db_engine = create_engine(
+            config["SQLALCHEMY_DATABASE_URI"],
+            pool_size=int(config.get("SQLALCHEMY_POOL_SIZE", 5)),
+            max_overflow=int(config.get("SQLALCHEMY_MAX_OVERFLOW", 10)),
+            pool_recycle=int(config.get("SQLALCHEMY_POOL_RECYCLE", -1)),
+            pool_timeout=int(config.get("SQLALCHEMY_POOL_TIMEOUT", 30)),
+            pool_pre_ping=True,
+        )
+        _add_pool_listeners(db_engine)
+        ScopedSession = scoped_session(sessionmaker(bind=db_engine))
+    return ScopedSession
+
+
+def get_session(config: dict) -> Session:
+    """Session for the current thread, call close_session when done with it"""
+    return setup_db(config)()
+
+
+def close_session():
+    if ScopedSession is not None:
+        ScopedSession.remove()
+
+
+def get_pool_stats() -> dict:
+    """Pool usage counters, to size the pool against consumer concurrency"""
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    if db_engine is not None:
+        stats.update(
+            {
+                "size": db_engine.pool.size(),
+                "checked_out": db_engine.pool.checkedout(),
+                "overflow": db_engine.pool.overflow(),
+            }
+        )
+    return stats
+
+
+def _add_pool_listeners(engine: Engine):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with _pool_stats_lock:
+            _pool_stats["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        overflow = engine.pool.overflow()
+        with _pool_stats_lock:
+            _pool_stats["checkouts"] += 1
+            _pool_stats["max_overflow"] = max(_pool_stats["max_overflow"], overflow)
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        with _pool_stats_lock:
+            _pool_stats["checkins"] += 1
@@ -1,5 +1,10 @@
+import json
 import logging
+from typing import Iterable, Iterator, List
 
+import pika
+
+from redwood_core.cache import gmail_api_client_cache, subscription_matcher_cache
 from redwood_core.factory import ManagerFactory
 from redwood_db.content import Article
 from redwood_db.user import User
@@ -10,50 +15,162 @@ from ._config import config
 
 logger = logging.getLogger(__name__)
 
+# Queue for batches of an initial gmail import, see import_gmail_newsletters
+GMAIL_IMPORT_BATCH_QUEUE = "gmail-import-batch"
+
 
 def import_gmail_newsletters(
     channel, method_frame, header_frame, message: ConnectedGoogleAccountMessage
 ):
+    """Fans out the import for a newly connected google account.
+
+    Publishes the new gmail message ids in batches of GMAIL_IMPORT_BATCH_SIZE to
+    GMAIL_IMPORT_BATCH_QUEUE as they are listed, so any number of consumers can
+    import them in parallel while listing continues. The current history id is
+    recorded once every batch is completed.
+    """
     logger.info(f"Starting gmail newsletter import for {message.serialize()}")
 
     # Object setup
-    session = db.setup_db_session(config["SQLALCHEMY_DATABASE_URI"])
-    factory = ManagerFactory(session, config)
-
-    user_manager = factory.get_manager("user")
-    content_manager = factory.get_manager("content")
-    triage_manager = factory.get_manager("triage")
-
-    # Setup Logic
-    user: User = session.query(User).get(message.user_id)
-    gmail_api_client = user_manager.get_gmail_api_client(user)
-    gmail_service = gmail_api_client.get_gmail_service()
-
-    messages = content_manager.get_new_emails(user)
-    # check if should add messages
-    for gmail_message_id in messages:
-        try:
-            if content_manager.is_email_newsletter(user, gmail_message_id):
-                gmail_message = gmail_api_client.get_email(gmail_message_id)
-                if gmail_message:
-                    logger.info(
-                        f"{user} gmail message id: {gmail_message_id} will be imported as whittle email."
-                    )
-                    new_article = content_manager.create_new_article_from_gmail(
-                        user, gmail_message
-                    )
-                    if new_article:
-                        if "UNREAD" not in gmail_message.get("labelIds"):
-                            box = triage_manager.get_user_library(user)
-                            triage_manager.create_new_triage(new_article, box)
-                    content_manager.commit_changes()
-        except Exception as e:
-            logger.error(
-                f"Failed importing gmail_message_id={gmail_message_id} for {message.serialize()}",
-                exc_info=e,
+    session = db.get_session(config)
+    try:
+        factory = ManagerFactory(session, config)
+
+        user_manager = factory.get_manager("user")
+        content_manager = factory.get_manager("content")
+
+        # Setup Logic
+        user: User = session.query(User).get(message.user_id)
+        # the account was just (re)connected, don't use a client with old credentials
+        gmail_api_client_cache.invalidate(user.id)
+        batch_size = int(config.get("GMAIL_IMPORT_BATCH_SIZE", 100))
+        new_emails = content_manager.stream_new_emails(user)
+        import_job = None
+        num_batches = 0
+        num_messages = 0
+        for batch in batch_message_ids(new_emails, batch_size):
+            if import_job is None:
+                import_job = content_manager.create_import_job(user)
+                # the job has to exist before any batch is consumed
+                content_manager.commit_changes()
+            publish_import_batch(
+                channel, import_job.id, user.id, num_batches, list(dict.fromkeys(batch))
+            )
+            num_batches += 1
+            num_messages += len(batch)
+
+        if import_job is not None:
+            # batches completed in the meantime are counted, see finish_import_job
+            content_manager.finish_import_job(
+                import_job.id, num_batches, new_emails.current_history_id
+            )
+            user_manager.save_refreshed_gmail_credentials(user)
+            content_manager.commit_changes()
+            logger.info(
+                f"Published {num_batches} import batches for {num_messages} gmail messages, {import_job}"
+            )
+        else:
+            user_manager.create_history_id(user, new_emails.current_history_id)
+            user_manager.save_refreshed_gmail_credentials(user)
+            content_manager.commit_changes()
+            logger.info(f"No gmail messages to import for {message.serialize()}")
+        # Acking message
+        channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+        logger.info(f"Acking message {message.serialize()}")
+    finally:
+        db.close_session()
+        logger.info(f"Database connection pool: {db.get_pool_stats()}")
+
+
+def batch_message_ids(
+    pages: Iterable[List[str]], batch_size: int
+) -> Iterator[List[str]]:
+    """Regroups pages of gmail message ids into batches of batch_size, the last one may be smaller"""
+    pending: List[str] = []
+    for page in pages:
+        pending.extend(page)
+        while len(pending) >= batch_size:
+            yield pending[:batch_size]
+            pending = pending[batch_size:]
+    if pending:
+        yield pending
+
+
+def publish_import_batch(
+    channel,
+    import_job_id: int,
+    user_id: int,
+    batch_index: int,
+    gmail_message_ids: List[str],
+):
+    body = {
+        "import_job_id": import_job_id,
+        "user_id": user_id,
+        "batch_index": batch_index,
+        "gmail_message_ids": gmail_message_ids,
+    }
+    channel.basic_publish(
+        exchange="",
+        routing_key=GMAIL_IMPORT_BATCH_QUEUE,
+        body=json.dumps(body),
+        properties=pika.BasicProperties(
+            content_type="application/json", delivery_mode=2  # persistent
+        ),
+    )
+
+
+def import_gmail_newsletter_batch(channel, method_frame, header_frame, body: bytes):
+    """Imports one batch of gmail messages published by import_gmail_newsletters.
+
+    A failed batch is requeued once, then dropped (the gmail sync job picks up
+    what's missing, since the history id isn't recorded).
+    """
+    batch = json.loads(body)
+    batch_description = (
+        f"import_job_id={batch['import_job_id']} batch_index={batch['batch_index']}"
+    )
+    logger.info(f"Starting gmail newsletter import for {batch_description}")
+
+    # Object setup
+    session = db.get_session(config)
+    try:
+        factory = ManagerFactory(session, config)
+        user_manager = factory.get_manager("user")
+        content_manager = factory.get_manager("content")
+
+        # Setup Logic
+        user: User = session.query(User).get(batch["user_id"])
+        # only newsletters that haven't been imported yet are downloaded
+        newsletters = content_manager.get_newsletter_emails(
+            user, batch["gmail_message_ids"]
+        )
+        batch_size = content_manager.get_article_insert_batch_size()
+        for i in range(0, len(newsletters), batch_size):
+            # read messages go straight to the library
+            created = content_manager.bulk_create_articles_from_gmail(
+                user, newsletters[i : i + batch_size], read_to_library=True
             )
-    logger.info(f"Completed gmail newsletter import for {message.serialize()}")
-    # Acking message
-    channel.basic_ack(delivery_tag=method_frame.delivery_tag)
-    logger.info(f"Acking message {message.serialize()}")
-    session.close()
+            content_manager.commit_changes()
+            logger.info(f"{user} imported {len(created)} whittle emails.")
+        if content_manager.complete_import_batch(
+            batch["import_job_id"], batch["batch_index"]
+        ):
+            logger.info(f"{user} completed import job {batch['import_job_id']}")
+        user_manager.save_refreshed_gmail_credentials(user)
+        content_manager.commit_changes()
+        logger.info(
+            f"Completed gmail newsletter import for {batch_description}. Subscription cache: {subscription_matcher_cache.stats()}"
+        )
+        channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+    except Exception as e:
+        session.rollback()
+        logger.error(
+            f"Failed gmail newsletter import for {batch_description}", exc_info=e
+        )
+        channel.basic_nack(
+            delivery_tag=method_frame.delivery_tag,
+            requeue=not method_frame.redelivered,
+        )
+    finally:
+        db.close_session()
+        logger.info(f"Database connection pool: {db.get_pool_stats()}")
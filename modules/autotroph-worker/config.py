@@ -2,6 +2,23 @@ import os
 
 # SQLALCHEMY
 SQLALCHEMY_DATABASE_URI = os.environ.get("SQLALCHEMY_DATABASE_URI")
+SQLALCHEMY_POOL_SIZE = int(os.environ.get("SQLALCHEMY_POOL_SIZE", 5))
+SQLALCHEMY_MAX_OVERFLOW = int(os.environ.get("SQLALCHEMY_MAX_OVERFLOW", 10))
+SQLALCHEMY_POOL_RECYCLE = int(os.environ.get("SQLALCHEMY_POOL_RECYCLE", 1800))
+SQLALCHEMY_POOL_TIMEOUT = int(os.environ.get("SQLALCHEMY_POOL_TIMEOUT", 30))
+
+# Initial import
+# gmail message ids per batch job published by the initial import
+GMAIL_IMPORT_BATCH_SIZE = int(os.environ.get("GMAIL_IMPORT_BATCH_SIZE", 100))
+
+# Article html transformation
+# worker processes for transforming html (0 transforms in process)
+ARTICLE_TRANSFORM_PROCESSES = int(os.environ.get("ARTICLE_TRANSFORM_PROCESSES", 0))
+ARTICLE_TRANSFORM_TIMEOUT = int(os.environ.get("ARTICLE_TRANSFORM_TIMEOUT", 60))
+# BeautifulSoup parser, "html.parser" or "lxml" (faster, output differs slightly)
+ARTICLE_HTML_PARSER = os.environ.get("ARTICLE_HTML_PARSER", "html.parser")
+# gmail messages saved (and committed) per batch
+ARTICLE_INSERT_BATCH_SIZE = int(os.environ.get("ARTICLE_INSERT_BATCH_SIZE", 50))
 
 # Logging
 tmp = os.environ.get("SUMM_LOG_FILE")
@@ -17,3 +34,29 @@ RMQ_USER = os.environ["RMQ_USER"]
 RMQ_PASSWORD = os.environ["RMQ_PASSWORD"]
 RMQ_HOST = os.environ["RMQ_HOST"]
 RMQ_PORT = os.environ["RMQ_PORT"]
+
+# Consumers, each with its own connection and channel
+# (keep SQLALCHEMY_POOL_SIZE + SQLALCHEMY_MAX_OVERFLOW >= RMQ_CONSUMER_COUNT)
+RMQ_CONSUMER_COUNT = int(os.environ.get("RMQ_CONSUMER_COUNT", 1))
+# unacked messages delivered to each consumer at a time
+RMQ_PREFETCH_COUNT = int(os.environ.get("RMQ_PREFETCH_COUNT", 1))
+
+# max gmail requests in flight across all consumers (0 for no limit)
+GMAIL_MAX_CONCURRENT_REQUESTS = int(os.environ.get("GMAIL_MAX_CONCURRENT_REQUESTS", 0))
+# gmail quota units per second across all consumers (0 for no limit), the project's quota
+# is 20,000, split it between the processes using gmail
+GMAIL_QUOTA_UNITS_PER_SECOND = float(
+    os.environ.get("GMAIL_QUOTA_UNITS_PER_SECOND", 5000)
+)
+# gmail quota units per second of each user (0 for no limit), a user's quota is 250
+GMAIL_USER_QUOTA_UNITS_PER_SECOND = float(
+    os.environ.get("GMAIL_USER_QUOTA_UNITS_PER_SECOND", 250)
+)
+# gmail requests at once over connections shared by all consumers (0 for a transport per user)
+GMAIL_HTTP_POOL_SIZE = int(os.environ.get("GMAIL_HTTP_POOL_SIZE", 10))
+
+# seconds a user's gmail client is cached for
+GMAIL_CLIENT_CACHE_TTL = int(os.environ.get("GMAIL_CLIENT_CACHE_TTL", 15 * 60))
+
+# keep box article counts up to date in the counter table, see the redwood config
+BOX_ARTICLE_COUNTERS = os.environ.get("BOX_ARTICLE_COUNTERS", "false").lower() == "true"
@@ -29,3 +29,20 @@ if tmp:
 tmp = os.environ.get("SUMM_LOG_FILE_SIZE")
 if tmp:
     SUMM_LOG_FILE_SIZE = tmp
+
+# seconds a user's gmail client is cached for
+GMAIL_CLIENT_CACHE_TTL = int(os.environ.get("GMAIL_CLIENT_CACHE_TTL", 15 * 60))
+
+# BeautifulSoup parser of article html, set the same in every service so articles
+# are transformed alike, see the autotroph-job config
+ARTICLE_HTML_PARSER = os.environ.get("ARTICLE_HTML_PARSER", "html.parser")
+
+# number of article ids in a single page of a box
+BOX_PAGE_SIZE = int(os.environ.get("BOX_PAGE_SIZE", 50))
+
+# keep box article counts in the counter table and read them from there instead of
+# counting triages, set in every service then run python -m redwood_core.box_counts
+BOX_ARTICLE_COUNTERS = os.environ.get("BOX_ARTICLE_COUNTERS", "false").lower() == "true"
+
+# maximum number of articles a search returns
+SEARCH_RESULT_LIMIT = int(os.environ.get("SEARCH_RESULT_LIMIT", 100))
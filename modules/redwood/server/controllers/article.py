@@ -18,17 +18,30 @@ triage_manager: TriageManager = manager_factory.get_manager("triage")
 
 
 class ArticleController(Resource):
+    query_args = {"fields": fields.DelimitedList(fields.String(), required=False)}
+
     @jwt.requires_auth
-    def get(self, id):
-        article = content_manager.get_article_by_id(id, g.user)
+    @use_args(query_args, location="querystring")
+    def get(self, args: dict, id):
+        """Gets article data, only the comma separated fields if passed"""
+        article_fields = args.get("fields")
+        try:
+            article = content_manager.get_article_by_id(id, g.user, article_fields)
+        except ValueError as e:
+            return responses.error(str(e), 400)
         if article is None:
             logger.info(f"Trying to get article with id={id} but it doesn't exists")
             return responses.error("Article not found.", 404)
-        return responses.success(article.to_json())
+        return responses.success(
+            content_manager.article_to_json(article, article_fields)
+        )
 
 
 class ArticlesListController(Resource):
-    query_args = {"articleIds": fields.List(fields.Integer(), required=True)}
+    query_args = {
+        "articleIds": fields.List(fields.Integer(), required=True),
+        "fields": fields.DelimitedList(fields.String(), required=False),
+    }
 
     @jwt.requires_auth
     @use_args(query_args, location="querystring")
@@ -36,25 +49,49 @@ class ArticlesListController(Resource):
         """Gets article data for given ids
 
         Args:
-            args ({'articleIds': List[int]}): [description]
+            args ({'articleIds': List[int], 'fields': Optional[List[str]]}): fields
+                are comma separated, like fields=id,title,source. List views should
+                pass them, html_content, text_content and outline are large
 
         Returns:
             200, {'articles': [Article.to_json(), ...]}
         """
-        articles = content_manager.get_articles_by_id(g.user, id, args["articleIds"])
+        article_fields = args.get("fields")
+        try:
+            articles = content_manager.get_articles_by_id(
+                g.user, id, args["articleIds"], article_fields
+            )
+        except ValueError as e:
+            return responses.error(str(e), 400)
         return responses.success(
-            {"articles": [article.to_json() for article in articles]}
+            {
+                "articles": [
+                    content_manager.article_to_json(article, article_fields)
+                    for article in articles
+                ]
+            }
         )
 
 
 class BoxArticlesListController(Resource):
+    query_args = {"cursor": fields.String(required=False)}
+
     @jwt.requires_auth
-    def get(self, id: int):
+    @use_args(query_args, location="querystring")
+    def get(self, args: dict, id: int):
         """
-        Get articles ids for box with id.
+        Get a page of article ids for box with id. Pass next_cursor back as cursor
+        to get the next page, next_cursor is null on the last page.
         """
-        article_ids = content_manager.get_articles_by_box_id(g.user, id)
-        return responses.success({"article_ids": article_ids})
+        try:
+            article_ids, next_cursor = content_manager.get_article_page_by_box_id(
+                g.user, id, args.get("cursor")
+            )
+        except ValueError:
+            return responses.error("Invalid cursor.", 400)
+        return responses.success(
+            {"article_ids": article_ids, "next_cursor": next_cursor}
+        )
 
 
 class ArticleSearchController(Resource):
@@ -64,17 +101,27 @@ class ArticleSearchController(Resource):
     @use_args(query_args, location="querystring")
     def get(self, args: dict):
         """
-        Gets article ids matching search query, sorted by box id of that article.
-        """
-        matches = {}
-        user_boxes = triage_manager.get_boxes_for_user(g.user)
-        for box in user_boxes:
-            article_ids = content_manager.get_articles_by_search_query(
-                g.user, box.id, args["query"].lower()
-            )
-            matches.update({box.id: article_ids})
+        Gets articles matching search query, grouped by box id of that article.
+        Best matches first.
 
-        ret = {"query": args["query"], "matches": matches}
+        Returns:
+            200, {
+                'query': str,
+                'matches': Map[Box.id -> List[Article.id]],
+                'results': Map[Box.id -> List[{
+                    'id', 'title', 'source', 'snippet', 'highlights': [[start, end], ...]
+                }]]
+            }
+        """
+        box_ids = [box.id for box in triage_manager.get_boxes_for_user(g.user)]
+        results = dict.fromkeys(box_ids, [])
+        results.update(content_manager.get_search_results(g.user, args["query"]))
+        matches = {
+            box_id: [result["id"] for result in box_results]
+            for box_id, box_results in results.items()
+        }
+
+        ret = {"query": args["query"], "matches": matches, "results": results}
         return responses.success(ret)
 
 
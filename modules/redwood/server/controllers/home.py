@@ -3,7 +3,7 @@ import logging
 from flask import g
 from flask_restful import Resource
 
-from redwood_core.content_manager import ContentManager
+from redwood_core.schedule_manager import SyncScheduleManager
 from redwood_core.triage_manager import TriageManager
 from redwood_core.user_manager import UserManager
 from redwood_db.user import User
@@ -14,7 +14,7 @@ from .. import jwt, manager_factory
 logger = logging.getLogger(__name__)
 user_manager: UserManager = manager_factory.get_manager("user")
 triage_manager: TriageManager = manager_factory.get_manager("triage")
-content_manager: ContentManager = manager_factory.get_manager("content")
+schedule_manager: SyncScheduleManager = manager_factory.get_manager("schedule")
 
 
 class UserHomeController(Resource):
@@ -33,13 +33,12 @@ class UserHomeController(Resource):
         # Get list of boxes for the user
         boxes = triage_manager.get_boxes_for_user(g.user)
         # Get count of articles per box
-        boxes_count = {
-            box.id: content_manager.get_num_articles_by_box_id(g.user, box.id)
-            for box in boxes
-        }
+        boxes_count = triage_manager.get_article_counts_by_box(g.user, boxes)
 
         user_config, new_config = user_manager.get_user_config(g.user)
-        if new_config:
+        # gmail is synced more often while the user is using the app
+        is_active_changed = schedule_manager.record_activity(g.user)
+        if new_config or is_active_changed:
             user_manager.commit_changes()
         ## JSON
         ret = {
@@ -36,12 +36,15 @@ class TriageController(Resource):
     @use_args(post_args, location="json")
     def post(self, args):
         """
-        Move an article into a new box, return the list of article ids for the target box.
+        Move an article into a new box, return the first page of article ids for the
+        target box. Pass next_cursor to BoxArticlesListController for the next pages.
         """
         new_triage = triage_manager.triage_article(
             g.user, args.get("article_id"), args.get("box_id")
         )
-        article_ids = content_manager.get_articles_by_box_id(g.user, args["box_id"])
-        ret = {"article_ids": article_ids}
+        article_ids, next_cursor = content_manager.get_article_page_by_box_id(
+            g.user, args["box_id"]
+        )
+        ret = {"article_ids": article_ids, "next_cursor": next_cursor}
         triage_manager.commit_changes()
         return responses.success(ret)